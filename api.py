@@ -1,88 +1,242 @@
-from flask import Flask, jsonify, request
-import sqlite3
-import pandas as pd
+from flask import Flask, g, jsonify, request, stream_with_context
 import os
 import json
-from datetime import datetime
+import math
+import sqlite3
+import argparse
+import hashlib
+import threading
+import time
+from kpi_excel import import_xlsx, InvalidWorkbookError, UnknownSheetError
+from kpi_loader import iter_json_rows, MissingColumnsError
+from kpi_store import region_connection, list_regions, source_hash, bulk_replace_kpis, upsert_kpis, query_history, query_rollups, query_scores, data_generation, to_epoch
+from kpi_store import InvalidRegionError, UnknownRegionError, KPI_COLUMNS, DEFAULT_PERIOD, DEFAULT_REGION, ROLLUP_GRAINS
+from kpi_wire import COLUMNAR_MIMETYPE, encode_columnar
+from kpi_metrics import inc, observe, timed, render_prometheus
 
 app = Flask(__name__)
 
-# Database setup
-def init_db():
-    conn = sqlite3.connect("kpi_database.db")
-    c = conn.cursor()
-    # Create table if it doesn't exist
-    c.execute('''CREATE TABLE IF NOT EXISTS kpis
-                 (kpi_name TEXT, rate REAL, target REAL, poids REAL, obj REAL, real REAL, score REAL, timestamp TEXT)''')
-    # Check if score column exists, add if missing
-    c.execute("PRAGMA table_info(kpis)")
-    columns = [info[1] for info in c.fetchall()]
-    if 'score' not in columns:
-        c.execute("ALTER TABLE kpis ADD COLUMN score REAL")
-    conn.commit()
-    return conn
-
-# Initialize database with JSON data
-def load_initial_data(json_file):
+# Named bucket sizes accepted by /api/kpis/history, in seconds; "day", "week"
+# and "month" are served from the precomputed rollups instead
+HISTORY_BUCKETS = {"minute": 60, "hour": 3600}
+
+# Most buckets per KPI a /api/kpis/rollups request may ask for
+MAX_ROLLUP_LIMIT = 1000
+
+# Distinct all-KPIs rollup payloads (grain and limit) cached per region; the
+# dashboards ask for one or two, any others are served uncached
+MAX_CACHED_ROLLUP_PAYLOADS = 8
+
+# Server-sent events: how often the process's generation watcher re-checks the
+# regions that have open streams (to catch writes from other processes), and the
+# keepalive interval. A disconnected client is only noticed when a write to it
+# fails (the second one after it left), so the keepalive also bounds how long it
+# holds a stream slot
+STREAM_POLL_SECONDS = 1.0
+STREAM_KEEPALIVE_SECONDS = 5.0
+
+# Every open event stream holds a server thread for as long as the client stays
+# connected, so streams are capped per process: serve.py gives them their own
+# threads and sets the cap to match; subscribers over the cap get a 503 and the
+# dashboard keeps polling until a slot frees up. Other servers (wsgi.py) have no
+# threads to spare unless configured, so streaming is off there by default.
+DEV_SERVER_MAX_STREAMS = 100
+MAX_STREAMS = int(os.getenv("API_MAX_STREAMS", "0"))
+STREAM_RETRY_AFTER_SECONDS = 30
+_stream_slots = threading.BoundedSemaphore(MAX_STREAMS) if MAX_STREAMS > 0 else None
+
+def set_stream_limit(limit):
+    global MAX_STREAMS, _stream_slots
+    MAX_STREAMS = limit
+    _stream_slots = threading.BoundedSemaphore(limit) if limit > 0 else None
+
+def acquire_stream_slot():
+    slots = _stream_slots
+    if slots is None or not slots.acquire(blocking=False):
+        return None
+    released = []
+
+    def release():
+        if not released:
+            released.append(True)
+            slots.release()
+    return release
+
+# Wakes up open event streams right after a write in this process, or when the
+# generation watcher saw another process write. Streams only wait on this
+# condition and read the database once per change, never while idle.
+_kpi_change = threading.Condition()
+_change_count = 0
+_stream_regions = {}  # region -> number of open streams
+_stream_generations = {}  # region -> generation the watcher last saw
+_watcher_pid = None
+
+def notify_kpi_change():
+    global _change_count
+    with _kpi_change:
+        _change_count += 1
+        _kpi_change.notify_all()
+
+# One thread per process reads the data generation of each region with open
+# streams every STREAM_POLL_SECONDS and wakes the streams when one changed
+def watch_generations():
+    while True:
+        time.sleep(STREAM_POLL_SECONDS)
+        with _kpi_change:
+            regions = list(_stream_regions)
+        changed = False
+        for region in regions:
+            try:
+                generation = data_generation(region_connection(region))
+            except Exception as e:
+                # e.g. the database is locked for a migration; try again next round
+                print(f"Error reading the data generation of region {region}: {e!r}")
+                continue
+            with _kpi_change:
+                if region in _stream_regions:
+                    changed = changed or _stream_generations.get(region, generation) != generation
+                    _stream_generations[region] = generation
+        if changed:
+            notify_kpi_change()
+
+# Started on the first stream of each process (fork() does not copy threads)
+def start_generation_watcher():
+    global _watcher_pid
+    with _kpi_change:
+        if _watcher_pid == os.getpid():
+            return
+        _watcher_pid = os.getpid()
+    threading.Thread(target=watch_generations, name="kpi-generation-watcher", daemon=True).start()
+
+JSON_FILE = os.path.join(os.path.dirname(__file__), "kpi_data.json")
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+# Initialize a region's database with JSON data. The file's content hash is
+# stored with the data, and an unchanged file is not loaded again unless forced.
+def load_initial_data(json_file, region=DEFAULT_REGION, force=False):
     if not os.path.exists(json_file):
         print(f"Error: JSON file not found at {json_file}")
         return False
     try:
-        with open(json_file, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        df = pd.DataFrame(data)
-        df = df.dropna(subset=["poids"])
-        # Convert numeric columns
-        df["Taux de réalisation"] = pd.to_numeric(df["Taux de réalisation"], errors="coerce") * 100
-        df["OBJECTIF 2025"] = pd.to_numeric(df["OBJECTIF 2025"], errors="coerce")
-        df["Réalisation 2025"] = pd.to_numeric(df["Réalisation 2025"], errors="coerce")
-        df["poids"] = pd.to_numeric(df["poids"], errors="coerce")
-        df["score"] = pd.to_numeric(df["score"], errors="coerce")
-        
-        # Handle missing Objectifs by using Column2 and Column3
-        df["Objectifs"] = df.apply(
-            lambda row: f"{row['Column2'] if pd.notna(row.get('Column2')) else 'Unknown'} - {row['Column3'] if pd.notna(row.get('Column3')) else 'Unknown'}" 
-            if pd.isna(row.get("Objectifs")) else row["Objectifs"], axis=1
-        )
-        
-        required_columns = ["Objectifs", "Taux de réalisation", "OBJECTIF 2025", "poids", "Réalisation 2025", "score"]
-        missing_columns = [col for col in required_columns if col not in df.columns]
-        if missing_columns:
-            print(f"Error: Missing required columns in JSON: {', '.join(missing_columns)}")
-            return False
-
-        conn = init_db()
-        c = conn.cursor()
-        c.execute("DELETE FROM kpis")  # Clear existing data
-        for _, row in df.iterrows():
-            if pd.notna(row["Objectifs"]):
-                c.execute("INSERT INTO kpis (kpi_name, rate, target, poids, obj, real, score, timestamp) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
-                          (row["Objectifs"], row["Taux de réalisation"], row["OBJECTIF 2025"], row["poids"],
-                           row["OBJECTIF 2025"], row["Réalisation 2025"], row["score"], datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
-        conn.commit()
-        conn.close()
-        print(f"Loaded {len(df)} records from {json_file} into database")
+        conn = region_connection(region, create=True)
+        source = (os.path.abspath(json_file), file_sha256(json_file))
+        if not force and source_hash(conn, source[0]) == source[1]:
+            print(f"{json_file} unchanged since last load, skipping (region {region})")
+            return True
+        # Records are parsed, coerced and written in chunks; the file is never fully in memory
+        count = bulk_replace_kpis(conn, iter_json_rows(json_file), source=source)
+        notify_kpi_change()
+        print(f"Loaded {count} records from {json_file} into database (region {region})")
         return True
+    except MissingColumnsError as e:
+        print(f"Error: {e}")
+        return False
     except Exception as e:
         print(f"Error loading JSON data: {str(e)}")
         return False
 
-# Load initial data from JSON file
-json_file = os.path.join(os.path.dirname(__file__), "kpi_data.json")
-if os.path.exists(json_file):
-    load_initial_data(json_file)
-else:
+# Startup ingest, run explicitly (python api.py / --ingest) rather than at import time
+def startup(json_file=JSON_FILE, force=False):
+    if os.path.exists(json_file):
+        return load_initial_data(json_file, force=force)
     print(f"Warning: JSON file not found at {json_file}. API will rely on existing database data.")
+    return True
 
-# API Endpoints
-@app.route('/api/kpis', methods=['GET'])
-def get_kpis():
-    conn = init_db()
+# Flask's JSON parser accepts NaN, Infinity and arbitrarily large integers, none of
+# which SQLite (64-bit integers) or strict JSON clients can take
+def is_storable_number(value):
+    if isinstance(value, bool):
+        return False
+    if isinstance(value, int):
+        return -2 ** 63 <= value < 2 ** 63
+    return isinstance(value, float) and math.isfinite(value)
+
+def is_nonempty_str(value):
+    return isinstance(value, str) and value != ""
+
+# Validate a list of API KPI records, returning an error message or None.
+# Reads, deltas and scores are keyed on kpi_name alone, so records may only
+# name the default period.
+def validate_kpi_records(data):
+    if not data or not isinstance(data, list):
+        return "Invalid data format, expected a list of KPI records"
+    if not all(isinstance(item, dict) and is_nonempty_str(item.get("kpi_name")) for item in data):
+        return "Every KPI record must be an object with a non-empty string kpi_name"
+    for item in data:
+        if item.get("period") not in (None, DEFAULT_PERIOD):
+            return f"period of KPI {item['kpi_name']!r} must be {DEFAULT_PERIOD!r} or omitted"
+        for col in KPI_COLUMNS[1:]:
+            value = item.get(col)
+            if value is not None and not is_storable_number(value):
+                return f"{col} of KPI {item['kpi_name']!r} must be a finite number or null"
+    return None
+
+# Convert an API KPI record into a DB row
+def record_to_row(item):
+    return tuple(item.get(col) for col in KPI_COLUMNS) + (item.get("period") or DEFAULT_PERIOD,)
+
+# Serialized GET payloads, reused until the data generation changes.
+# Writes from any process bump the generation, which invalidates the cache.
+# A miss is rebuilt by one thread per payload; the others (e.g. every event
+# stream woken by the same write) wait for it and reuse its snapshot.
+_payload_cache = {}
+_payload_cache_lock = threading.Lock()
+_rebuild_locks = {}
+
+def _cached_payload(key, generation, label, result):
+    with _payload_cache_lock:
+        cached = _payload_cache.get(key)
+    if cached and cached["generation"] == generation:
+        inc("kpi_cache_requests_total", payload=label, result=result)
+        return dict(cached)
+    return None
+
+# `label` names the payload in metrics (default `name`); it must come from a
+# small fixed set, unlike `name`, which may include request parameters
+def cached_snapshot(name, query, region=DEFAULT_REGION, label=None):
+    conn = region_connection(region)
+    key = (region, name)
+    label = label or name
+    cached = _cached_payload(key, data_generation(conn), label, "hit")
+    if cached:
+        return cached
+    with _payload_cache_lock:
+        rebuild_lock = _rebuild_locks.setdefault(key, threading.Lock())
+    with rebuild_lock:
+        generation = data_generation(conn)
+        cached = _cached_payload(key, generation, label, "coalesced")
+        if cached:
+            return cached
+        inc("kpi_cache_requests_total", payload=label, result="miss")
+        with timed("kpi_db_query_seconds", query=label):
+            records = query(conn)
+        with timed("kpi_serialize_seconds", payload=label, format="json"):
+            body = app.json.dumps(records).encode("utf-8")
+        etag = hashlib.sha256(body).hexdigest()[:32]
+        snapshot = {"generation": generation, "records": records, "body": body, "etag": etag, "encoded": {}}
+        with _payload_cache_lock:
+            _payload_cache[key] = snapshot
+    return dict(snapshot)
+
+# Whether a payload whose name starts with `prefix` may be cached for `region`:
+# it is cached already, or fewer than `limit` such payloads are
+def payload_cache_has_room(region, name, prefix, limit):
+    with _payload_cache_lock:
+        if (region, name) in _payload_cache:
+            return True
+        return sum(1 for key in _payload_cache if key[0] == region and key[1].startswith(prefix)) < limit
+
+def query_kpis(conn):
     c = conn.cursor()
-    c.execute("SELECT kpi_name, rate, target, poids, obj, real, score FROM kpis ORDER BY timestamp DESC LIMIT 16")
-    data = c.fetchall()
-    conn.close()
-    return jsonify([{
+    # Insertion order, i.e. the order of the source file; upserts keep a KPI's place
+    c.execute("SELECT kpi_name, rate, target, poids, obj, real, score FROM kpis ORDER BY rowid")
+    return [{
         "kpi_name": row[0],
         "rate": row[1],
         "target": row[2],
@@ -90,24 +244,289 @@ def get_kpis():
         "obj": row[4],
         "real": row[5],
         "score": row[6]
-    } for row in data])
+    } for row in c.fetchall()]
+
+def cached_kpis_snapshot(region=DEFAULT_REGION):
+    return cached_snapshot("kpis", query_kpis, region)
+
+# JSON response for a cached snapshot with its ETag; answers 304 Not Modified
+# when If-None-Match matches
+def conditional_json(snapshot):
+    response = app.response_class(snapshot["body"], mimetype="application/json")
+    response.set_etag(snapshot["etag"])
+    response.headers["Cache-Control"] = "no-cache"
+    return response.make_conditional(request)
 
-@app.route('/api/kpis', methods=['POST'])
-def update_kpis():
+# KPI snapshot in the format the client asked for: JSON by default, the compact
+# columnar encoding (kpi_wire) with `Accept: application/vnd.kpi.columnar`.
+# The columnar body is encoded once per snapshot and kept in the payload cache.
+def negotiated_kpis(snapshot):
+    if request.accept_mimetypes.best_match(["application/json", COLUMNAR_MIMETYPE]) != COLUMNAR_MIMETYPE:
+        response = conditional_json(snapshot)
+    else:
+        with _payload_cache_lock:
+            body = snapshot["encoded"].get(COLUMNAR_MIMETYPE)
+        if body is None:
+            with timed("kpi_serialize_seconds", payload="kpis", format="columnar"):
+                body = encode_columnar(snapshot["records"])
+            with _payload_cache_lock:
+                snapshot["encoded"][COLUMNAR_MIMETYPE] = body
+        response = app.response_class(body, mimetype=COLUMNAR_MIMETYPE)
+        response.set_etag(snapshot["etag"] + "-columnar")
+        response.headers["Cache-Control"] = "no-cache"
+        response = response.make_conditional(request)
+    response.vary.add("Accept")
+    return response
+
+# Difference between two KPI snapshots: changed/added records, removed names,
+# and the full name order when the set of KPIs changed
+def kpi_delta(previous, current):
+    before = {record["kpi_name"]: record for record in previous}
+    current_order = [record["kpi_name"] for record in current]
+    current_names = set(current_order)
+    delta = {
+        "changed": [record for record in current if before.get(record["kpi_name"]) != record],
+        "removed": [name for name in before if name not in current_names],
+    }
+    if [record["kpi_name"] for record in previous] != current_order:
+        delta["order"] = current_order
+    return delta
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+# A write that waited longer than busy_timeout for another process/thread's
+# transaction: ask the client to retry instead of failing with a 500
+@app.errorhandler(sqlite3.OperationalError)
+def database_busy(error):
+    if "locked" not in str(error) and "busy" not in str(error):
+        raise error
+    inc("kpi_db_busy_total")
+    response = jsonify({"error": "Database is busy, please retry"})
+    response.status_code = 503
+    response.headers["Retry-After"] = "1"
+    return response
+
+# API Endpoints
+# Every KPI endpoint exists as /api/<region>/... and, for the default region, /api/...
+@app.errorhandler(InvalidRegionError)
+def invalid_region(error):
+    return jsonify({"error": str(error)}), 400
+
+@app.errorhandler(UnknownRegionError)
+def unknown_region(error):
+    return jsonify({"error": str(error)}), 404
+
+# Request latency and status counts for /metrics
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    endpoint = request.endpoint or "unknown"
+    if "request_start" in g:
+        observe("kpi_http_request_seconds", time.perf_counter() - g.request_start, endpoint=endpoint)
+    inc("kpi_http_responses_total", endpoint=endpoint, status=response.status_code)
+    return response
+
+# Counters and timings of this process in the Prometheus text format
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    return app.response_class(render_prometheus(), mimetype="text/plain; version=0.0.4")
+
+@app.route('/api/regions', methods=['GET'])
+def get_regions():
+    return jsonify(list_regions())
+
+@app.route('/api/kpis', methods=['GET'], defaults={"region": DEFAULT_REGION})
+@app.route('/api/<region>/kpis', methods=['GET'])
+def get_kpis(region):
+    return negotiated_kpis(cached_kpis_snapshot(region))
+
+# Weighted scores per KPI group and for the region, read from the kpi_scores
+# summary that every ingest keeps up to date
+@app.route('/api/scores', methods=['GET'], defaults={"region": DEFAULT_REGION})
+@app.route('/api/<region>/scores', methods=['GET'])
+def get_scores(region):
+    return conditional_json(cached_snapshot("scores", query_scores, region))
+
+# Server-sent events: a full "snapshot" event on connect, then a "delta" event
+# each time a write commits, with keepalive comments in between
+@app.route('/api/kpis/stream', methods=['GET'], defaults={"region": DEFAULT_REGION})
+@app.route('/api/<region>/kpis/stream', methods=['GET'])
+def stream_kpis(region):
+    region_connection(region)  # Reject invalid or unknown regions before streaming starts
+    release_slot = acquire_stream_slot()
+    if release_slot is None:
+        inc("kpi_stream_rejected_total")
+        reason = "Too many open event streams" if MAX_STREAMS else "Event streams are disabled on this server"
+        response = jsonify({"error": f"{reason}, poll /api/kpis instead"})
+        response.status_code = 503
+        response.headers["Retry-After"] = str(STREAM_RETRY_AFTER_SECONDS)
+        return response
+
+    start_generation_watcher()
+
+    def events():
+        with _kpi_change:
+            _stream_regions[region] = _stream_regions.get(region, 0) + 1
+            seen = _change_count
+        try:
+            snapshot = cached_kpis_snapshot(region)
+            with _kpi_change:
+                # The watcher's baseline for a newly watched region
+                _stream_generations.setdefault(region, snapshot["generation"])
+            yield sse_event("snapshot", {"generation": snapshot["generation"], "kpis": snapshot["records"]})
+            last_sent = time.monotonic()
+            while True:
+                keepalive_in = STREAM_KEEPALIVE_SECONDS - (time.monotonic() - last_sent)
+                with _kpi_change:
+                    _kpi_change.wait_for(lambda: _change_count != seen, timeout=max(0, keepalive_in))
+                    count = _change_count
+                if count != seen:
+                    seen = count
+                    current = cached_kpis_snapshot(region)
+                    if current["generation"] != snapshot["generation"]:
+                        delta = kpi_delta(snapshot["records"], current["records"])
+                        snapshot = current
+                        if delta["changed"] or delta["removed"] or "order" in delta:
+                            yield sse_event("delta", dict(delta, generation=current["generation"]))
+                            last_sent = time.monotonic()
+                if time.monotonic() - last_sent >= STREAM_KEEPALIVE_SECONDS:
+                    yield ": keepalive\n\n"
+                    last_sent = time.monotonic()
+        finally:
+            with _kpi_change:
+                _stream_regions[region] -= 1
+                if not _stream_regions[region]:
+                    del _stream_regions[region]
+                    _stream_generations.pop(region, None)
+
+    response = app.response_class(stream_with_context(events()), mimetype="text/event-stream")
+    # Runs when the server closes the response, i.e. when the client disconnects
+    response.call_on_close(release_slot)
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
+
+# One KPI's history for a period (default DEFAULT_PERIOD): ?kpi=, optional
+# from/to and bucket (minute, hour, day, week, month or seconds). Raw points
+# need a from/to range; query_history caps every response at its point limit
+# and bounds how far back a seconds bucket aggregates.
+@app.route('/api/kpis/history', methods=['GET'], defaults={"region": DEFAULT_REGION})
+@app.route('/api/<region>/kpis/history', methods=['GET'])
+def get_kpi_history(region):
+    kpi_name = request.args.get("kpi")
+    if not kpi_name:
+        return jsonify({"error": "Missing required parameter: kpi"}), 400
+    period = request.args.get("period") or DEFAULT_PERIOD
+    bucket = request.args.get("bucket")
+    try:
+        start = to_epoch(request.args.get("from"))
+        end = to_epoch(request.args.get("to"))
+    except ValueError:
+        return jsonify({"error": "Invalid from/to value, expected epoch seconds or ISO 8601"}), 400
+    if bucket is not None and bucket not in ROLLUP_GRAINS:
+        try:
+            bucket = HISTORY_BUCKETS[bucket] if bucket in HISTORY_BUCKETS else int(bucket)
+        except ValueError:
+            bucket = 0
+        if bucket <= 0:
+            names = ", ".join(list(HISTORY_BUCKETS) + list(ROLLUP_GRAINS))
+            return jsonify({"error": f"bucket must be one of {names} or a positive number of seconds"}), 400
+    if bucket is None and start is None and end is None:
+        return jsonify({"error": "Raw history needs from or to; pass a bucket for the full range"}), 400
+
+    points = query_history(region_connection(region), kpi_name, start, end, bucket, period)
+    return jsonify({"region": region, "kpi": kpi_name, "period": period, "bucket": bucket, "points": points})
+
+# Daily/weekly/monthly rollups (last, min, max and average rate and score per
+# bucket) maintained as KPIs are written: ?grain=day|week|month, optional kpi,
+# from/to and limit (latest buckets per KPI). The all-KPIs form the dashboard
+# polls for its sparklines is served from the payload cache with an ETag, for
+# up to MAX_CACHED_ROLLUP_PAYLOADS grain/limit combinations per region.
+@app.route('/api/kpis/rollups', methods=['GET'], defaults={"region": DEFAULT_REGION})
+@app.route('/api/<region>/kpis/rollups', methods=['GET'])
+def get_kpi_rollups(region):
+    grain = request.args.get("grain", "day")
+    if grain not in ROLLUP_GRAINS:
+        return jsonify({"error": f"grain must be one of: {', '.join(ROLLUP_GRAINS)}"}), 400
+    kpi_name = request.args.get("kpi")
+    try:
+        start = to_epoch(request.args.get("from"))
+        end = to_epoch(request.args.get("to"))
+        limit = int(request.args["limit"]) if request.args.get("limit") else None
+    except ValueError:
+        return jsonify({"error": "Invalid from/to/limit value"}), 400
+    if limit is not None and not 0 < limit <= MAX_ROLLUP_LIMIT:
+        return jsonify({"error": f"limit must be between 1 and {MAX_ROLLUP_LIMIT}"}), 400
+
+    name = f"rollups:{grain}:{limit}"
+    if (kpi_name is None and start is None and end is None
+            and payload_cache_has_room(region, name, "rollups:", MAX_CACHED_ROLLUP_PAYLOADS)):
+        query = lambda conn: {"region": region, "grain": grain, "kpis": query_rollups(conn, grain, limit=limit)}  # noqa: E731
+        return conditional_json(cached_snapshot(name, query, region, label="rollups"))
+    rollups = query_rollups(region_connection(region), grain, kpi_name, start, end, limit)
+    return jsonify({"region": region, "grain": grain, "kpis": rollups})
+
+@app.route('/api/kpis', methods=['POST'], defaults={"region": DEFAULT_REGION})
+@app.route('/api/<region>/kpis', methods=['POST'])
+def update_kpis(region):
     data = request.get_json()
-    if not data or not isinstance(data, list):
-        return jsonify({"error": "Invalid data format, expected a list of KPI records"}), 400
+    error = validate_kpi_records(data)
+    if error:
+        return jsonify({"error": error}), 400
     
-    conn = init_db()
-    c = conn.cursor()
-    c.execute("DELETE FROM kpis")  # Replace all data (adjust as needed for incremental updates)
-    for item in data:
-        c.execute("INSERT INTO kpis (kpi_name, rate, target, poids, obj, real, score, timestamp) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
-                  (item.get("kpi_name"), item.get("rate"), item.get("target"), item.get("poids"),
-                   item.get("obj"), item.get("real"), item.get("score"), datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
-    conn.commit()
-    conn.close()
+    # Replace the region's data atomically; use PATCH for incremental updates
+    bulk_replace_kpis(region_connection(region, create=True), (record_to_row(item) for item in data))
+    notify_kpi_change()
     return jsonify({"message": "KPI data updated successfully"}), 200
 
+# Upload an .xlsx score workbook (multipart field "file", optional "sheet") and
+# replace the region's KPIs with it; the sheet is parsed in streaming mode
+@app.route('/api/kpis/import', methods=['POST'], defaults={"region": DEFAULT_REGION})
+@app.route('/api/<region>/kpis/import', methods=['POST'])
+def import_kpis(region):
+    upload = request.files.get("file")
+    if upload is None or not upload.filename:
+        return jsonify({"error": "Missing uploaded file in field 'file'"}), 400
+    try:
+        count = import_xlsx(upload.stream, region, request.form.get("sheet") or None)
+    except (MissingColumnsError, UnknownSheetError) as e:
+        return jsonify({"error": str(e)}), 400
+    except (InvalidWorkbookError, OSError):
+        return jsonify({"error": "Uploaded file is not a valid .xlsx workbook"}), 400
+    notify_kpi_change()
+    return jsonify({"message": "KPI data imported successfully", "records": count}), 200
+
+@app.route('/api/kpis', methods=['PATCH'], defaults={"region": DEFAULT_REGION})
+@app.route('/api/<region>/kpis', methods=['PATCH'])
+def patch_kpis(region):
+    data = request.get_json()
+    error = validate_kpi_records(data)
+    if error:
+        return jsonify({"error": error}), 400
+
+    # Only KPIs that are new or whose values changed are written
+    changed = upsert_kpis(region_connection(region, create=True), (record_to_row(item) for item in data))
+    if changed:
+        notify_kpi_change()
+    return jsonify({"message": "KPI data updated successfully", "received": len(data), "changed": changed}), 200
+
 if __name__ == '__main__':
-    app.run(debug=True, host='0.0.0.0', port=8501)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="KPI API server")
+    parser.add_argument("--ingest", action="store_true", help="load kpi_data.json into the database and exit")
+    parser.add_argument("--force", action="store_true", help="reload kpi_data.json even if it is unchanged")
+    parser.add_argument("--skip-ingest", action="store_true", help="start without loading kpi_data.json")
+    args = parser.parse_args()
+    if not args.skip_ingest:
+        ok = startup(force=args.force)
+        if args.ingest:
+            raise SystemExit(0 if ok else 1)
+    # Development server; use serve.py (gunicorn) in production. The reloader
+    # re-runs this block in a child process, where the unchanged file is skipped.
+    # It starts a thread per request, so streams cannot starve other requests.
+    if "API_MAX_STREAMS" not in os.environ:
+        set_stream_limit(DEV_SERVER_MAX_STREAMS)
+    app.run(debug=True, host='0.0.0.0', port=int(os.getenv("API_PORT", "8502")))
\ No newline at end of file
@@ -1,11 +1,17 @@
 import streamlit as st
-import pandas as pd
-import plotly.graph_objects as go
+import html
 import os
 import time
-import sqlite3
+import threading
 import requests
 import json
+from kpi_gauges import kpi_gauge_figure, kpi_gauge_svg, gauge_grid_figure, regional_gauge_figure, sparkline_svg
+from kpi_layout import layout_pages, group_bands_html, REGION_SLOT
+from kpi_metrics import inc, observe, timed, timer, snapshot
+from kpi_loader import load_kpi_frame, frame_to_rows, gauge_arrays, MissingColumnsError
+from kpi_mirror import queue_kpis
+from kpi_store import weighted_score
+from kpi_wire import COLUMNAR_MIMETYPE, apply_kpi_event, decode_kpi_rows, record_to_kpi
 
 # Set page configuration for full-screen TV display
 st.set_page_config(layout="wide", page_title="KPI Dashboard", initial_sidebar_state="collapsed")
@@ -77,45 +83,27 @@ st.markdown(
             border: 0.2vw solid #f59e0b;
             margin: 1% 0;
         }
-        .group-title {
-            background-color: #000099; /* Bright blue for group titles */
-            color: white;
-            font-size: 1.4vw;
-            text-align: center;
-            padding: 0.5%; /* Reduced padding for tighter contact */
-            margin-bottom: 5; /* Removed margin to eliminate gap */
-            border-radius: 5px 5px 0 0; /* Rounded top edges, flat bottom to align with gauges */
-            width: 49.7%;
+        .group-bands {
+            display: flex;
+            width: 100%;
         }
-        .Technique {
+        .group-band {
             background-color: #000099; /* Bright blue for group titles */
             color: white;
             font-size: 1.4vw;
             text-align: center;
             padding: 0.5%; /* Reduced padding for tighter contact */
-            margin-bottom: 5; /* Removed margin to eliminate gap */
+            box-sizing: border-box;
+            border: 0.2vw solid #ffffff; /* Gap between neighbouring bands */
             border-radius: 5px 5px 0 0; /* Rounded top edges, flat bottom to align with gauges */
-            width: 66.4%;
         }
-        .st {
-            background-color: #000099; /* Bright blue for group titles */
-            color: white;
-            font-size: 1.4vw;
-            text-align: center;
-            padding: 0.5%; /* Reduced padding for tighter contact */
-            margin-bottom: 5; /* Removed margin to eliminate gap */
-            border-radius: 5px 5px 0 0; /* Rounded top edges, flat bottom to align with gauges */
-            width: 32.7%;
+        .group-band.empty {
+            background-color: transparent;
         }
-        .str {
-            background-color: #000099; /* Bright blue for group titles */
-            color: white;
-            font-size: 1.4vw;
-            text-align: center;
-            padding: 0.5%; /* Reduced padding for tighter contact */
-            margin-bottom: 5; /* Removed margin to eliminate gap */
-            border-radius: 5px 5px 0 0; /* Rounded top edges, flat bottom to align with gauges */
-            width: 20.7%;
+        .page-indicator {
+            text-align: right;
+            color: #1a202c;
+            font-size: 1vw;
         }
         .kpi-title {
             background-color: #2563eb; /* Bright blue for KPI titles */
@@ -140,6 +128,23 @@ st.markdown(
             margin-bottom: 0.5%;
             border-radius: 5px 5px 0 0;
         }
+        .sparkline {
+            text-align: center;
+            line-height: 0;
+            margin-top: -0.5%;
+        }
+        .debug-overlay {
+            position: fixed;
+            bottom: 1%;
+            right: 1%;
+            z-index: 1000;
+            background-color: rgba(26, 32, 44, 0.85);
+            color: #f7fafc;
+            font-family: monospace;
+            font-size: 0.7vw;
+            padding: 0.5%;
+            border-radius: 5px;
+        }
         .error-message {
             font-size: 2vw;
             color: #ff4444;
@@ -153,281 +158,338 @@ st.markdown(
     unsafe_allow_html=True
 )
 
-# Database setup
-def init_db():
-    conn = sqlite3.connect("kpi_database.db")
-    c = conn.cursor()
-    c.execute('''CREATE TABLE IF NOT EXISTS kpis
-                 (kpi_name TEXT, rate REAL, target REAL, poids REAL, obj REAL, real REAL, score REAL, timestamp TEXT)''')
-    c.execute("PRAGMA table_info(kpis)")
-    columns = [info[1] for info in c.fetchall()]
-    if 'score' not in columns:
-        c.execute("ALTER TABLE kpis ADD COLUMN score REAL")
-    conn.commit()
-    return conn
+# Parsed kpi_data.json (cached on file mtime), or None after showing the error
+def load_json_kpis(json_file):
+    try:
+        return load_kpi_frame(json_file)
+    except MissingColumnsError as e:
+        st.markdown(f"<div class='error-message'>{html.escape(str(e))}</div>", unsafe_allow_html=True)
+        return None
 
+# Local SQLite mirror (kpi_mirror.MIRROR_DB_PATH, never the API's database):
+# snapshots are queued and written behind by kpi_mirror, coalesced and limited
+# to KPIs whose values changed
 def save_to_db(kpi_data):
-    conn = init_db()
-    c = conn.cursor()
-    for kpi in kpi_data:
-        score = kpi[6] if len(kpi) > 6 else None
-        c.execute("INSERT OR REPLACE INTO kpis (kpi_name, rate, target, poids, obj, real, score, timestamp) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
-                  (kpi[0], kpi[1], kpi[2], kpi[3], kpi[4], kpi[5], score, time.ctime()))
-    conn.commit()
-    conn.close()
+    queue_kpis(kpi_data)
 
 # API simulation
-API_URL = os.getenv("API_URL", "http://localhost:8501/api/kpis")
-@st.cache_data(ttl=10)
-def fetch_kpi_data():
+API_URL = os.getenv("API_URL", "http://localhost:8502/api/kpis")
+
+# Gauge rendering: "plotly" (one reused figure template per gauge), "grid" (all
+# gauges in a single Plotly figure) or "html" (lightweight SVG gauges)
+GAUGE_RENDER_MODE = os.getenv("GAUGE_RENDER_MODE", "plotly")
+
+# Trend sparkline under each gauge from the API's precomputed rollups:
+# SPARKLINE_GRAIN is "day", "week", "month" or "none"; SPARKLINE_POINTS buckets
+SPARKLINE_GRAIN = os.getenv("SPARKLINE_GRAIN", "day")
+SPARKLINE_POINTS = int(os.getenv("SPARKLINE_POINTS", "30"))
+
+# Debug overlay with this process's timings and counters: KPI_DEBUG_OVERLAY=1
+# or ?debug=1 in the dashboard URL
+DEBUG_OVERLAY = os.getenv("KPI_DEBUG_OVERLAY", "0") == "1"
+
+# Paging for large KPI sets: rows of gauges per page and rotation interval
+KPI_ROWS_PER_PAGE = int(os.getenv("KPI_ROWS_PER_PAGE", "3"))
+PAGE_ROTATE_SECONDS = float(os.getenv("PAGE_ROTATE_SECONDS", "15"))
+
+# Background polling of the API: interval, (connect, read) timeouts and the
+# exponential backoff applied after consecutive failures
+API_POLL_SECONDS = float(os.getenv("API_POLL_SECONDS", "10"))
+API_TIMEOUT = (3.05, 10)
+API_RETRY_BASE_SECONDS = 1
+API_RETRY_MAX_SECONDS = 60
+
+# Wire format for GET /api/kpis: "json" (default) or "columnar" (kpi_wire's
+# packed float64 columns, smaller and decoded without per-record dicts)
+API_WIRE_FORMAT = os.getenv("API_WIRE_FORMAT", "json")
+KPI_ACCEPT = COLUMNAR_MIMETYPE if API_WIRE_FORMAT == "columnar" else "application/json"
+
+# Pooled keep-alive HTTP session; each background thread owns one
+def api_session():
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=2, pool_maxsize=2)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+STREAM_URL = os.getenv("API_STREAM_URL", API_URL.rstrip("/") + "/stream")
+STREAM_RETRY_SECONDS = 5
+
+# Apply one server-sent event from /api/kpis/stream to the shared stream state
+def apply_stream_event(stream, event, payload):
+    kpi_data = apply_kpi_event(stream["kpi_data"], event, payload)
+    if kpi_data is None or kpi_data == stream["kpi_data"]:
+        return False
+    stream["kpi_data"] = kpi_data
+    stream["version"] += 1
+    save_to_db(kpi_data)
+    return True
+
+# Background subscriber: keeps the latest KPIs pushed by the API, reconnecting on failure
+def listen_kpi_stream(stream):
+    session = api_session()
+    while True:
+        retry_after = STREAM_RETRY_SECONDS
+        try:
+            with session.get(STREAM_URL, stream=True, timeout=(5, 60)) as response:
+                if response.status_code == 503:
+                    # Every stream slot is taken: keep polling and try again later
+                    retry_after = max(STREAM_RETRY_SECONDS, int(response.headers.get("Retry-After", 0)))
+                response.raise_for_status()
+                stream["connected"] = True
+                event = None
+                for line in response.iter_lines(decode_unicode=True):
+                    if line.startswith("event:"):
+                        event = line[6:].strip()
+                    elif line.startswith("data:") and apply_stream_event(stream, event, json.loads(line[5:])):
+                        # New values: let the poller refresh the regional score now
+                        stream["changed"].set()
+        except (requests.exceptions.RequestException, ValueError, KeyError):
+            pass
+        except Exception as e:
+            # Keep the thread alive; the poller takes over while disconnected
+            print(f"Error reading the KPI stream: {e!r}")
+        finally:
+            stream["connected"] = False
+        time.sleep(retry_after)
+
+@st.cache_resource
+def kpi_stream():
+    stream = {"connected": False, "version": 0, "kpi_data": None, "changed": threading.Event()}
+    threading.Thread(target=listen_kpi_stream, args=(stream,), daemon=True).start()
+    return stream
+
+SCORES_URL = os.getenv("API_SCORES_URL", API_URL.rstrip("/").rsplit("/", 1)[0] + "/scores")
+ROLLUPS_URL = os.getenv("API_ROLLUPS_URL", API_URL.rstrip("/") + "/rollups")
+
+# GET `url`, revalidating with the ETag from the previous response. Returns
+# (etag, response), or (etag, None) when the server answered 304.
+def conditional_get(session, url, etag, accept="application/json"):
+    headers = {"Accept": accept}
+    if etag:
+        headers["If-None-Match"] = etag
+    response = session.get(url, headers=headers, timeout=API_TIMEOUT)
+    if response.status_code == 304:
+        return etag, None
+    response.raise_for_status()
+    return response.headers.get("ETag"), response
+
+# KPI tuples from a GET /api/kpis response in either wire format
+def response_kpis(response):
+    if response.headers.get("Content-Type", "").startswith(COLUMNAR_MIMETYPE):
+        return decode_kpi_rows(response.content)
+    return [record_to_kpi(item) for item in response.json()]
+
+# KPIs from kpi_data.json when the API is unreachable, mirrored to SQLite
+def json_fallback(feed):
+    json_file = os.path.join(os.path.dirname(__file__), "kpi_data.json")
+    if not os.path.exists(json_file):
+        feed["error"] = f"kpi_data.json not found at {json_file}. Please add it and rerun the app."
+        return None
     try:
-        response = requests.get(API_URL, timeout=10)
-        response.raise_for_status()
-        data = response.json()
-        kpi_data = [(item["kpi_name"], item["rate"], item["target"], item["poids"], item["obj"], item["real"], item.get("score"))
-                    for item in data]
-        if not kpi_data:
-            st.markdown("<div class='error-message'>API returned no data.</div>", unsafe_allow_html=True)
-        save_to_db(kpi_data)
-        return kpi_data
-    except requests.exceptions.RequestException as e:
-        json_file = os.path.join(os.path.dirname(__file__), "kpi_data.json")
-        if os.path.exists(json_file):
-            with open(json_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            required_columns = ["Objectifs", "Taux de réalisation", "OBJECTIF 2025", "poids", "Réalisation 2025", "score", "Column2", "Column3"]
-            df = pd.DataFrame(data)
-            missing_columns = [col for col in required_columns if col not in df.columns]
-            if missing_columns:
-                st.markdown(f"<div class='error-message'>Missing required columns in JSON: {', '.join(missing_columns)}</div>", unsafe_allow_html=True)
-                return []
-            df = df[required_columns]
-            df = df.dropna(subset=["poids"])
-            df["Taux de réalisation"] = pd.to_numeric(df["Taux de réalisation"], errors="coerce") * 100
-            kpi_data = [(row["Objectifs"], row["Taux de réalisation"], row["OBJECTIF 2025"], row["poids"], row["OBJECTIF 2025"], row["Réalisation 2025"], row["score"])
-                        for _, row in df.iterrows() if pd.notna(row["Objectifs"])]
+        kpi_data = frame_to_rows(load_kpi_frame(json_file))
+    except MissingColumnsError as e:
+        feed["error"] = str(e)
+        return None
+    save_to_db(kpi_data)
+    return kpi_data
+
+# Store new values in the feed and bump its version so the dashboard reruns
+def update_feed(feed, **values):
+    feed.update(values)
+    feed["version"] += 1
+
+# One poll of GET /api/kpis (skipped while the stream is live) and GET /api/scores.
+# Unchanged data costs a 304 and no parsing; each update bumps feed["version"]
+# as it is stored, so a later request failing does not lose it.
+@timer("kpi_dashboard_poll_seconds")
+def poll_api(session, feed, stream):
+    if not (stream["connected"] and stream["kpi_data"]):
+        etag, response = conditional_get(session, API_URL, feed["kpis_etag"] if feed["kpi_data"] is not None else None,
+                                         KPI_ACCEPT)
+        if response is not None:
+            kpi_data = response_kpis(response)
             save_to_db(kpi_data)
-            return kpi_data
-        else:
-            st.markdown(f"<div class='error-message'>kpi_data.json not found at {json_file}. Please add it and rerun the app.</div>", unsafe_allow_html=True)
-            return []
+            update_feed(feed, kpis_etag=etag, kpi_data=kpi_data, from_json=False,
+                        error=None if kpi_data else "API returned no data.")
+    etag, response = conditional_get(session, SCORES_URL, feed["scores_etag"])
+    if response is not None:
+        update_feed(feed, scores_etag=etag, score=response.json()["score"])
+    if SPARKLINE_GRAIN != "none":
+        url = f"{ROLLUPS_URL}?grain={SPARKLINE_GRAIN}&limit={SPARKLINE_POINTS}"
+        etag, response = conditional_get(session, url, feed["trends_etag"])
+        if response is not None:
+            trends = {name: tuple(point["rate"] for point in points) for name, points in response.json()["kpis"].items()}
+            update_feed(feed, trends_etag=etag, trends=trends)
+
+# Background poller: keeps the last-known-good KPIs and regional score in `feed`
+# and retries failed polls with exponential backoff. The script run never waits
+# on the network; it only reads this snapshot. Any error is logged and retried:
+# the thread is started once per process and must never die.
+def poll_kpi_api(feed, stream):
+    session = api_session()
+    failures = 0
+    while True:
+        try:
+            poll_api(session, feed, stream)
+            failures = 0
+            delay = API_POLL_SECONDS
+        except Exception as e:
+            if not isinstance(e, (requests.exceptions.RequestException, ValueError, KeyError)):
+                print(f"Unexpected error polling the KPI API: {e!r}")
+            inc("kpi_dashboard_poll_failures_total")
+            failures += 1
+            delay = min(API_RETRY_MAX_SECONDS, API_RETRY_BASE_SECONDS * 2 ** (failures - 1))
+            # No API data yet (or ever): serve kpi_data.json until the API answers
+            if feed["kpi_data"] is None or feed["from_json"]:
+                try:
+                    kpi_data = json_fallback(feed)
+                except Exception as e:
+                    # e.g. kpi_data.json being rewritten; try again next round
+                    print(f"Error loading kpi_data.json: {e!r}")
+                    kpi_data = None
+                if kpi_data is not None and kpi_data != feed["kpi_data"]:
+                    update_feed(feed, kpi_data=kpi_data, kpis_etag=None, from_json=True)
+        stream["changed"].wait(delay)
+        stream["changed"].clear()
+
+@st.cache_resource
+def kpi_poller(_stream):
+    feed = {"version": 0, "kpi_data": None, "kpis_etag": None, "score": None, "scores_etag": None,
+            "trends": {}, "trends_etag": None, "from_json": False, "error": None}
+    threading.Thread(target=poll_kpi_api, args=(feed, _stream), daemon=True).start()
+    return feed
+
+# Regional score from the API's materialized summary (GET /api/scores), as last
+# polled; computed from the displayed KPIs until the API has answered
+def regional_score_of(feed, kpi_data):
+    if feed["score"] is not None:
+        return feed["score"]
+    score_sum = sum(kpi[6] or 0 for kpi in kpi_data)
+    poids_sum = sum(kpi[3] or 0 for kpi in kpi_data)
+    return weighted_score(score_sum, poids_sum)
+
+def debug_overlay_html(metrics):
+    lines = []
+    for name, series in metrics.items():
+        for labels, value in series:
+            label = ",".join(f"{key}={val}" for key, val in labels.items())
+            name_label = f"{name}{{{label}}}" if label else name
+            if isinstance(value, dict):
+                lines.append(f"{name_label}: {value['count']} x {value['avg'] * 1000:.2f} ms")
+            else:
+                lines.append(f"{name_label}: {value}")
+    return "<div class='debug-overlay'>" + "<br>".join(lines) + "</div>"
+
+# Visible page; with several pages the display rotates every PAGE_ROTATE_SECONDS
+def current_page(page_count):
+    if page_count <= 1 or PAGE_ROTATE_SECONDS <= 0:
+        return 0
+    return int(time.time() // PAGE_ROTATE_SECONDS) % page_count
+
+# Reruns the dashboard only when the stream or the poller delivered new data or
+# the page rotates; the check itself is local, so an idle display does no work
+@st.fragment(run_every=1)
+def watch_kpi_feed(version, page_idx=0, page_count=1):
+    stream = kpi_stream()
+    if stream["version"] + kpi_poller(stream)["version"] != version or current_page(page_count) != page_idx:
+        st.rerun(scope="app")
 
 # Initialize data
 json_file = os.path.join(os.path.dirname(__file__), "kpi_data.json")
 if "df" not in st.session_state:
     if os.path.exists(json_file):
-        with open(json_file, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        required_columns = ["Objectifs", "Taux de réalisation", "OBJECTIF 2025", "poids", "Réalisation 2025", "score", "Column2", "Column3"]
-        df = pd.DataFrame(data)
-        missing_columns = [col for col in required_columns if col not in df.columns]
-        if missing_columns:
-            st.markdown(f"<div class='error-message'>Missing required columns in JSON: {', '.join(missing_columns)}</div>", unsafe_allow_html=True)
+        df = load_json_kpis(json_file)
+        if df is None:
             st.stop()
-        df = df[required_columns]
         st.session_state.df = df
     else:
         st.markdown(f"<div class='error-message'>kpi_data.json not found at {json_file}. Please add it and rerun the app.</div>", unsafe_allow_html=True)
         st.stop()
 
-# Clean and prepare data
+# Data is already cleaned and typed by kpi_loader
 if "df" in st.session_state:
     df = st.session_state.df
-    df = df.dropna(subset=["poids"])
-    df["Taux de réalisation"] = pd.to_numeric(df["Taux de réalisation"], errors="coerce") * 100
-    df["score"] = pd.to_numeric(df["score"], errors="coerce")
-    df["OBJECTIF 2025"] = pd.to_numeric(df["OBJECTIF 2025"], errors="coerce")
-    df["Réalisation 2025"] = pd.to_numeric(df["Réalisation 2025"], errors="coerce")
-    df["poids"] = pd.to_numeric(df["poids"], errors="coerce")
 
     # Manual refresh button
     if st.button("Refresh Data", help="Update graphs with the latest JSON data", key="refresh_button"):
         if os.path.exists(json_file):
-            with open(json_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            required_columns = ["Objectifs", "Taux de réalisation", "OBJECTIF 2025", "poids", "Réalisation 2025", "score", "Column2", "Column3"]
-            df = pd.DataFrame(data)
-            missing_columns = [col for col in required_columns if col not in df.columns]
-            if missing_columns:
-                st.markdown(f"<div class='error-message'>Missing required columns in JSON: {', '.join(missing_columns)}</div>", unsafe_allow_html=True)
+            df = load_json_kpis(json_file)
+            if df is None:
                 st.stop()
-            df = df[required_columns]
             st.session_state.df = df
             st.rerun()
 
-    # Fetch KPI data
-    kpi_data = fetch_kpi_data()
-    if not kpi_data and os.path.exists(json_file):
-        with open(json_file, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        required_columns = ["Objectifs", "Taux de réalisation", "OBJECTIF 2025", "poids", "Réalisation 2025", "score", "Column2", "Column3"]
-        df = pd.DataFrame(data)
-        missing_columns = [col for col in required_columns if col not in df.columns]
-        if missing_columns:
-            st.markdown(f"<div class='error-message'>Missing required columns in JSON: {', '.join(missing_columns)}</div>", unsafe_allow_html=True)
-            kpi_data = []
-        else:
-            df = df[required_columns]
-            kpi_data = [(row["Objectifs"], row["Taux de réalisation"], row["OBJECTIF 2025"], row["poids"], row["OBJECTIF 2025"], row["Réalisation 2025"], row["score"])
-                        for _, row in df.iterrows() if pd.notna(row["Objectifs"])]
-            save_to_db(kpi_data)
+    # KPI data from memory only: live values pushed by the API stream, else the
+    # background poller's last-known-good snapshot, else the local JSON file
+    render_start = time.perf_counter()
+    stream = kpi_stream()
+    feed = kpi_poller(stream)
+    feed_version = stream["version"] + feed["version"]
+    kpi_data = stream["kpi_data"] if stream["connected"] and stream["kpi_data"] else feed["kpi_data"]
+    if feed["error"]:
+        st.markdown(f"<div class='error-message'>{html.escape(feed['error'])}</div>", unsafe_allow_html=True)
+    if not kpi_data:
+        kpi_data = frame_to_rows(df)
+
+    # Data-driven layout: KPIs are grouped by their "Group - KPI" name prefix and
+    # laid out in pages; only the visible page is built and rendered
+    max_cols = 6
+    pages = layout_pages([kpi[0] for kpi in kpi_data], max_cols, KPI_ROWS_PER_PAGE)
+    page_idx = current_page(len(pages))
+    page = pages[page_idx]
+    page_indexes = [cell["index"] for row in page for cell in row["cells"] if cell and cell["index"] is not None]
+    gauge_values, gauge_colors = gauge_arrays([kpi_data[i][6] for i in page_indexes], [kpi_data[i][3] for i in page_indexes])
+    gauges = {i: (float(value), str(color)) for i, value, color in zip(page_indexes, gauge_values, gauge_colors)}
 
-    # Dynamic dashboard layout with row spanning and Commercial spanning
     st.markdown("<div class='content'>", unsafe_allow_html=True)
     st.markdown("<h1>Tableau de bord des Indicateurs Clés de Performance (KPIs)</h1>", unsafe_allow_html=True)
     st.markdown("<hr>", unsafe_allow_html=True)
+    if len(pages) > 1:
+        st.markdown(f"<div class='page-indicator'>Page {page_idx + 1} / {len(pages)}</div>", unsafe_allow_html=True)
 
-    # Add full-width Commercial spanning for the first two KPIs
-    st.markdown("""
-<div style="display:flex; width:100%;">
-    <div style="flex:1;background-color:#000099; color:white; text-align:center;background-color: #000099; /* Bright blue for group titles */
-            color: white;
-            font-size: 1.4vw;
-            text-align: center;
-            padding: 0.5%; /* Reduced padding for tighter contact */
-            margin-bottom: 5; /* Removed margin to eliminate gap */
-            border-radius: 5px 5px 0 0; /* Rounded top edges, flat bottom to align with gauges */
-            width: 45.4%;">Commercial</div>
-    <div style="flex:1; background-color:#000099; color:white; text-align:center;            background-color: #000099; /* Bright blue for group titles */
-            color: white;
-            font-size: 1.4vw;
-            text-align: center;
-                top:0.5%;
-            padding: 0.5%; /* Reduced padding for tighter contact */
-            margin-bottom: 5; /* Removed margin to eliminate gap */
-            right:5%;
-            border-radius: 5px 5px 0 0; /* Rounded top edges, flat bottom to align with gauges */
-            width: 10.4%;">Technique</div>
-</div>
-""", unsafe_allow_html=True)
-
-    current_group = None
-    group_positions = []  # Store (row_idx, col_idx, group_title) for each group start
-    max_cols = 6
-    rows = [st.columns(max_cols)]  # Initialize with first row
-    row_idx = 0
-    col_idx = 0
-
-    for idx, (kpi_name, rate, target, poids, obj, real, score) in enumerate(kpi_data[:17]):
-        # Split KPI name at the hyphen
-        parts = kpi_name.split(" - ", 1)  # Split at the first hyphen
-        group_title = parts[0] if len(parts) > 0 else kpi_name
-        subcategory = parts[1] if len(parts) > 1 else kpi_name
-
-        gauge_value = min((score / poids * 100) if poids != 0 and score is not None else 0, 100)
-        color = "#17b248" if gauge_value >= 100 else '#ffa500' if gauge_value >= 80 else '#dc143c'
-
-        # Start a new group
-        if current_group != group_title and idx >= 2:  # Apply group logic only after the first two KPIs
-            if current_group is not None:
-                group_positions.append((group_start_idx // max_cols, group_start_idx % max_cols, current_group))
-            current_group = group_title
-            group_start_idx = idx
-
-        # Add full-width Technique spanning for KPIs 4 to 10
-        if 3 <= idx <= 9:
-            if idx == 3:
-                st.markdown("""
-<div style="display:flex; width:101%;">
-    <div style="width:65.7%; background-color:#000099;font-size: 1.4vw;            padding: 0.5%; /* Reduced padding for tighter contact */
-            margin-bottom: 5; /* Removed margin to eliminate gap */
-            border-radius: 5px 5px 0 ;color:white; text-align:center;">Technique</div>
-    <div style="width:33.6%; background-color:#000099;font-size: 1.4vw;            padding: 0.5%; /* Reduced padding for tighter contact */
-            margin-bottom: 5; /* Removed margin to eliminate gap */
-            border-radius: 5px 5px 0; color:white; text-align:center;">Stratigique</div>
-</div>
-""", unsafe_allow_html=True)
-
-        # Add full-width B2C spanning for KPIs 
-        if 12 <= idx <= 13:
-            if idx == 12:
-                st.markdown("""
-<div style="display:flex; width:83%;">
-    <div style="width:40%; background-color:#000099;font-size: 1.4vw;            padding: 0.5%; /* Reduced padding for tighter contact */
-            margin-bottom: 5; /* Removed margin to eliminate gap */
-            border-radius: 5px 5px 0 ;color:white; text-align:center;">Stratigique</div>
-    <div style="width:40%; background-color:#000099;font-size: 1.4vw;            padding: 0.5%; /* Reduced padding for tighter contact */
-            margin-bottom: 5; /* Removed margin to eliminate gap */
-            border-radius: 5px 5px 0 ;color:white; text-align:center;">Financier</div>
-</div>
-""", unsafe_allow_html=True)
-
-        # Manage row and column indices
-        if col_idx >= max_cols:
-            row_idx += 1
-            while len(rows) <= row_idx:
-                rows.append(st.columns(max_cols))
-            col_idx = 0
-
-        with rows[row_idx][col_idx]:
-            st.markdown(f"<div class='subcategory-band'>{subcategory}</div>", unsafe_allow_html=True)
-            fig = go.Figure(go.Indicator(
-                mode="gauge+number",
-                value=gauge_value,
-                domain={'x': [0, 1], 'y': [0, 1]},
-                gauge={'shape': "angular",
-                       'axis': {'range': [0, 100], 'tickvals': [0, 100], 'ticktext': ['0%', '100%']},
-                       'bar': {'color': color, 'thickness': 0.3},
-                       'bgcolor': "white",
-                       'borderwidth': 2,
-                       'bordercolor': "#2d3748"},
-                number={'valueformat': ".1f", 'suffix': "%", 'font': {'size': 20, 'color': color, 'family': 'Arial, sans-serif', 'weight': 'bold'}},
-            ))
-            fig.add_annotation(
-                text=f"{score * 100:.1f}%" if score is not None else "0%",
-                xref="paper", yref="paper",
-                x=0.5, y=0.5,
-                showarrow=False,
-                font=dict(size=20, color=color, family="Arial, sans-serif", weight="bold")
-            )
-            fig.update_layout(
-                height=120,
-                width=110,
-                margin=dict(l=2, r=2, t=15, b=5),
-                paper_bgcolor='rgba(0,0,0,0)',
-                plot_bgcolor='rgba(0,0,0,0)',
-                showlegend=False
-            )
-            st.plotly_chart(fig)
-
-        col_idx += 1
-
-    # Handle the last group
-    if current_group is not None and len(kpi_data) > 2:
-        group_positions.append((group_start_idx // max_cols, group_start_idx % max_cols, current_group))
-
-    # Add regional score dynamically
-    if len(rows) > 2 and 5 < max_cols:  # Ensure regional score fits in the last row, column 5
-        with rows[2][5]:
-            st.markdown("<div class='kpi-title'>Score de la Région</div>", unsafe_allow_html=True)
-            regional_score = 90.33
-            regional_color = "#f59e0b"  # Match the existing gauge bar color
-            fig_score = go.Figure(go.Indicator(
-                mode="gauge",  # Single score via annotation
-                value=regional_score,
-                domain={'x': [0, 1], 'y': [0, 1]},
-                gauge={'shape': "angular",
-                       'axis': {'range': [0, 100], 'visible': False},
-                       'bar': {'color': regional_color, 'thickness': 0.6},
-                       'bgcolor': "white",
-                       'borderwidth': 2,
-                       'bordercolor': "#131414"},
-            ))
-            fig_score.add_annotation(
-                text=f"{regional_score:.2f}%",
-                xref="paper", yref="paper",
-                x=0.5, y=0.5,
-                showarrow=False,
-                font=dict(size=20, color=regional_color, family="Arial, sans-serif", weight="bold")
-            )
-            fig_score.update_layout(
-                height=120,  # Match height of other gauges for consistency
-                width=110,   # Match width of other gauges for consistency
-                margin=dict(l=2, r=2, t=15, b=5),  # Consistent margins
-                paper_bgcolor='rgba(0,0,0,0)',
-                plot_bgcolor='rgba(0,0,0,0)',
-                showlegend=False
-            )
-            st.plotly_chart(fig_score)
+    # Grid mode: each row's gauges (and the regional score) in a single Plotly
+    # figure under the row's group bands, one serialization per row
+    if GAUGE_RENDER_MODE == "grid":
+        for row_idx, row in enumerate(page):
+            st.markdown(group_bands_html(row["bands"], max_cols), unsafe_allow_html=True)
+            cells = [(cell["subcategory"], *gauges[cell["index"]], kpi_data[cell["index"]][6])
+                     if cell and cell["kind"] != REGION_SLOT else None for cell in row["cells"]]
+            has_region = any(cell and cell["kind"] == REGION_SLOT for cell in row["cells"])
+            regional_score = (regional_score_of(feed, kpi_data) or 0) if has_region else None
+            with timed("kpi_dashboard_render_seconds", stage="grid"):
+                st.plotly_chart(gauge_grid_figure(cells[:-1] if has_region else cells, max_cols, regional_score),
+                                key=f"gauge-grid-{row_idx}")
+    else:
+        for row in page:
+            st.markdown(group_bands_html(row["bands"], max_cols), unsafe_allow_html=True)
+            columns = st.columns(max_cols)
+            for col_idx, cell in enumerate(row["cells"]):
+                if cell is None:
+                    continue
+                with columns[col_idx]:
+                    if cell["kind"] == REGION_SLOT:
+                        st.markdown("<div class='kpi-title'>Score de la Région</div>", unsafe_allow_html=True)
+                        regional_score = regional_score_of(feed, kpi_data) or 0
+                        fig_score = regional_gauge_figure(regional_score)
+                        st.plotly_chart(fig_score, key="gauge-region")
+                        continue
+                    idx = cell["index"]
+                    score = kpi_data[idx][6]
+                    gauge_value, color = gauges[idx]
+                    # KPI names come from unauthenticated POST/PATCH requests
+                    st.markdown(f"<div class='subcategory-band'>{html.escape(cell['subcategory'])}</div>", unsafe_allow_html=True)
+                    with timed("kpi_dashboard_render_seconds", stage="gauge"):
+                        if GAUGE_RENDER_MODE == "html":
+                            st.markdown(kpi_gauge_svg(gauge_value, color, score), unsafe_allow_html=True)
+                        else:
+                            st.plotly_chart(kpi_gauge_figure(gauge_value, color, score), key=f"gauge-{idx}")
+                    trend = sparkline_svg(feed["trends"].get(kpi_data[idx][0], ()))
+                    if trend:
+                        st.markdown(f"<div class='sparkline'>{trend}</div>", unsafe_allow_html=True)
 
     st.markdown("</div>", unsafe_allow_html=True)
+    observe("kpi_dashboard_render_seconds", time.perf_counter() - render_start, stage="page")
+    if DEBUG_OVERLAY or st.query_params.get("debug") == "1":
+        st.markdown(debug_overlay_html(snapshot()), unsafe_allow_html=True)
+    watch_kpi_feed(feed_version, page_idx, len(pages))
@@ -0,0 +1,91 @@
+# Concurrent load benchmark: N reader threads running the GET /api/kpis query
+# (api.query_kpis, without the payload cache) while one writer upserts KPIs,
+# comparing the old connection-per-request pattern (rollback journal, schema
+# check each time) with kpi_store.get_connection.
+# Usage: python benchmarks/bench_concurrency.py [readers] [seconds]
+import os
+import sqlite3
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import kpi_store  # noqa: E402
+from api import query_kpis  # noqa: E402
+from synthetic import synthetic_rows  # noqa: E402
+
+KPI_COUNT = 2000
+
+def legacy_connection(db_path):
+    # What every request used to do: fresh connection plus schema statements
+    conn = sqlite3.connect(db_path)
+    conn.execute(kpi_store.CREATE_KPIS_SQL)
+    conn.execute("PRAGMA table_info(kpis)").fetchall()
+    conn.commit()
+    return conn
+
+# Same KPIs, new values for every version
+def rows(version):
+    return list(synthetic_rows(KPI_COUNT, seed=version))
+
+def run(mode, readers, seconds):
+    db_path = os.path.join(tempfile.mkdtemp(prefix="kpi_bench_"), "bench.db")
+    conn = kpi_store.init_db(db_path)
+    if mode == "legacy":
+        conn.execute("PRAGMA journal_mode = DELETE")
+    kpi_store.bulk_replace_kpis(conn, rows(0))
+    conn.close()
+
+    stop = threading.Event()
+    read_latencies, write_latencies = [], []
+
+    def open_conn():
+        return legacy_connection(db_path) if mode == "legacy" else kpi_store.get_connection(db_path)
+
+    def reader():
+        local = []
+        while not stop.is_set():
+            start = time.perf_counter()
+            conn = open_conn()
+            query_kpis(conn)
+            if mode == "legacy":
+                conn.close()
+            local.append(time.perf_counter() - start)
+        read_latencies.extend(local)
+
+    def writer():
+        version = 0
+        while not stop.is_set():
+            version += 1
+            start = time.perf_counter()
+            conn = open_conn()
+            kpi_store.upsert_kpis(conn, rows(version))
+            if mode == "legacy":
+                conn.close()
+            write_latencies.append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=reader) for _ in range(readers)] + [threading.Thread(target=writer)]
+    for t in threads:
+        t.start()
+    time.sleep(seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+    return read_latencies, write_latencies
+
+def summary(latencies):
+    if len(latencies) < 2:
+        return f"{len(latencies):>7} ops"
+    q = statistics.quantiles(latencies, n=100)
+    return f"{len(latencies):>7} ops  p50 {q[49] * 1000:7.2f} ms  p99 {q[98] * 1000:7.2f} ms"
+
+if __name__ == "__main__":
+    readers = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 5
+    for mode in ("legacy", "pooled"):
+        reads, writes = run(mode, readers, seconds)
+        print(f"{mode:<7} reads  {summary(reads)}")
+        print(f"{mode:<7} writes {summary(writes)}")
@@ -0,0 +1,47 @@
+# Benchmark for time-range history queries (kpi_store.query_history).
+# Usage: python benchmarks/bench_history.py [history_rows] [kpi_count]
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import kpi_store  # noqa: E402
+from synthetic import synthetic_history, synthetic_rows  # noqa: E402
+
+STEP = 60
+
+# Points every STEP seconds up to now, so queries without a range see the latest ones
+def populate(conn, rows, kpi_count):
+    per_kpi = rows // kpi_count
+    start_ts = int(time.time()) - per_kpi * STEP
+    conn.execute("BEGIN")
+    conn.executemany("INSERT INTO kpi_history (kpi_name, ts, period, rate, score) VALUES (?, ?, ?, ?, ?)",
+                     synthetic_history(kpi_count, per_kpi, start_ts, STEP))
+    kpi_store._rebuild_rollups(conn.cursor())
+    conn.commit()
+    return per_kpi
+
+def timed(label, fn, repeat=20):
+    fn()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        points = fn()
+    elapsed = (time.perf_counter() - start) / repeat
+    print(f"{label:<36} {elapsed * 1000:8.2f} ms  {len(points):>6} points")
+
+if __name__ == "__main__":
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    kpi_count = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    conn = kpi_store.init_db(os.path.join(tempfile.mkdtemp(prefix="kpi_bench_"), "bench.db"))
+    per_kpi = populate(conn, rows, kpi_count)
+    end_ts = int(time.time())
+    kpi_name = list(synthetic_rows(kpi_count))[7 % kpi_count][0]
+    print(f"{rows} history rows, {kpi_count} KPIs, {per_kpi} points per KPI")
+    timed("last day, raw", lambda: kpi_store.query_history(conn, kpi_name, end_ts - 86400, end_ts))
+    timed("last week, hourly buckets", lambda: kpi_store.query_history(conn, kpi_name, end_ts - 7 * 86400, end_ts, 3600))
+    timed("full range, daily rollups", lambda: kpi_store.query_history(conn, kpi_name, None, None, "day"))
+    timed("no range, hourly buckets", lambda: kpi_store.query_history(conn, kpi_name, None, None, 3600))
+    timed("no range, 86400 s buckets", lambda: kpi_store.query_history(conn, kpi_name, None, None, 86400))
+    timed("full range, raw (point limit)", lambda: kpi_store.query_history(conn, kpi_name))
@@ -0,0 +1,28 @@
+# Benchmark for the bulk KPI ingestion path (kpi_store.bulk_replace_kpis).
+# Usage: python benchmarks/bench_ingest.py [sizes...]
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import kpi_store  # noqa: E402
+from synthetic import synthetic_rows  # noqa: E402
+
+DEFAULT_SIZES = [1_000, 100_000, 1_000_000]
+
+def bench(n):
+    # Each size runs against a fresh scratch database
+    conn = kpi_store.init_db(os.path.join(tempfile.mkdtemp(prefix="kpi_bench_"), "bench.db"))
+    start = time.perf_counter()
+    count = kpi_store.bulk_replace_kpis(conn, synthetic_rows(n))
+    elapsed = time.perf_counter() - start
+    conn.close()
+    return count, elapsed
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES
+    for n in sizes:
+        count, elapsed = bench(n)
+        print(f"{count:>10} rows  {elapsed:8.3f} s  {count / elapsed:12.0f} rows/s")
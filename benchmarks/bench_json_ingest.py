@@ -0,0 +1,56 @@
+# Memory/throughput benchmark for loading kpi_data.json into SQLite: the
+# streaming path (kpi_loader.iter_json_rows) against json.load + DataFrame.
+# Usage: python benchmarks/bench_json_ingest.py [sizes...]
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import kpi_loader  # noqa: E402
+import kpi_store  # noqa: E402
+from synthetic import synthetic_records  # noqa: E402
+
+DEFAULT_SIZES = [10_000, 100_000, 500_000]
+
+def write_json(path, n):
+    # Written incrementally so generating the file does not skew the numbers
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("[")
+        for i, record in enumerate(synthetic_records(n)):
+            f.write(("," if i else "") + json.dumps(record, ensure_ascii=False))
+        f.write("]")
+
+def in_memory_load(conn, json_file):
+    df = kpi_loader.prepare_kpi_frame(kpi_loader.read_kpi_json(json_file))
+    return kpi_store.bulk_replace_kpis(conn, kpi_loader.frame_to_rows(df))
+
+def streaming_load(conn, json_file):
+    return kpi_store.bulk_replace_kpis(conn, kpi_loader.iter_json_rows(json_file))
+
+def measure(label, load, json_file):
+    conn = kpi_store.init_db(os.path.join(tempfile.mkdtemp(prefix="kpi_bench_"), "bench.db"))
+    start = time.perf_counter()
+    count = load(conn, json_file)
+    elapsed = time.perf_counter() - start
+    conn.close()
+    # Second run under tracemalloc for the peak Python heap
+    conn = kpi_store.init_db(os.path.join(tempfile.mkdtemp(prefix="kpi_bench_"), "bench.db"))
+    tracemalloc.start()
+    load(conn, json_file)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    conn.close()
+    print(f"  {label:<10} {count:>8} rows  {elapsed:7.2f} s  {count / elapsed:9.0f} rows/s  peak {peak / 1e6:8.1f} MB")
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES
+    for n in sizes:
+        json_file = os.path.join(tempfile.mkdtemp(prefix="kpi_bench_"), "kpi_data.json")
+        write_json(json_file, n)
+        print(f"{n} records, {os.path.getsize(json_file) / 1e6:.1f} MB file")
+        measure("in-memory", in_memory_load, json_file)
+        measure("streaming", streaming_load, json_file)
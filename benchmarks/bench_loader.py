@@ -0,0 +1,54 @@
+# Benchmark for kpi_loader on a synthetic kpi_data.json-shaped file, compared
+# with the previous per-row pipeline (DataFrame.apply/iterrows + Python gauges).
+# Usage: python benchmarks/bench_loader.py [rows]
+import json
+import os
+import sys
+import tempfile
+import time
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import kpi_loader  # noqa: E402
+from synthetic import synthetic_records  # noqa: E402
+
+def legacy_load(json_file):
+    with open(json_file, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    df = pd.DataFrame(data)
+    df = df.dropna(subset=["poids"])
+    for col in ["Taux de réalisation", "OBJECTIF 2025", "Réalisation 2025", "poids", "score"]:
+        df[col] = pd.to_numeric(df[col], errors="coerce")
+    df["Taux de réalisation"] = df["Taux de réalisation"] * 100
+    df["Objectifs"] = df.apply(
+        lambda row: f"{row['Column2'] if pd.notna(row.get('Column2')) else 'Unknown'} - {row['Column3'] if pd.notna(row.get('Column3')) else 'Unknown'}"
+        if pd.isna(row.get("Objectifs")) else row["Objectifs"], axis=1
+    )
+    kpi_data = [(row["Objectifs"], row["Taux de réalisation"], row["OBJECTIF 2025"], row["poids"], row["OBJECTIF 2025"], row["Réalisation 2025"], row["score"])
+                for _, row in df.iterrows()]
+    gauges = []
+    for kpi in kpi_data:
+        gauge_value = min((kpi[6] / kpi[3] * 100) if kpi[3] != 0 and kpi[6] is not None else 0, 100)
+        gauges.append((gauge_value, "#17b248" if gauge_value >= 100 else '#ffa500' if gauge_value >= 80 else '#dc143c'))
+    return kpi_data, gauges
+
+def vectorized_load(json_file):
+    df = kpi_loader.load_kpi_frame(json_file)
+    return kpi_loader.frame_to_rows(df), df
+
+def timed(label, fn):
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28} {elapsed * 1000:10.1f} ms")
+
+if __name__ == "__main__":
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    json_file = os.path.join(tempfile.mkdtemp(prefix="kpi_bench_"), "kpi_data.json")
+    with open(json_file, "w", encoding="utf-8") as f:
+        json.dump(list(synthetic_records(rows)), f, ensure_ascii=False)
+    print(f"{rows} records, {os.path.getsize(json_file) / 1e6:.1f} MB")
+    timed("legacy (iterrows)", lambda: legacy_load(json_file))
+    timed("kpi_loader, cold", lambda: vectorized_load(json_file))
+    timed("kpi_loader, cached frame", lambda: kpi_loader.load_kpi_frame(json_file))
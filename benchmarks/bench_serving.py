@@ -0,0 +1,107 @@
+# Serving benchmark: starts serve.py (gunicorn) with 1, 2 and 4 worker processes
+# on a scratch database and hammers GET /api/kpis and /api/scores from client
+# threads while one client PATCHes KPIs, reporting throughput and latency.
+# Usage: python benchmarks/bench_serving.py [clients] [seconds]
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import kpi_store  # noqa: E402
+from synthetic import api_records, synthetic_rows  # noqa: E402
+
+KPI_COUNT = 500
+WORKER_COUNTS = (1, 2, 4)
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def seed_database(db_path):
+    conn = kpi_store.init_db(db_path)
+    kpi_store.bulk_replace_kpis(conn, synthetic_rows(KPI_COUNT))
+    conn.close()
+
+def start_server(db_path, port, workers):
+    env = dict(os.environ, KPI_DB_PATH=db_path)
+    server = subprocess.Popen(
+        [sys.executable, "serve.py", "--skip-ingest", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--threads", "4"],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    for _ in range(100):
+        try:
+            requests.get(f"http://127.0.0.1:{port}/api/regions", timeout=1)
+            return server
+        except requests.ConnectionError:
+            time.sleep(0.1)
+    server.kill()
+    raise RuntimeError("server did not start")
+
+def run(workers, clients, seconds):
+    db_path = os.path.join(tempfile.mkdtemp(prefix="kpi_bench_"), "bench.db")
+    seed_database(db_path)
+    port = free_port()
+    server = start_server(db_path, port, workers)
+    base = f"http://127.0.0.1:{port}/api"
+    stop = threading.Event()
+    latencies, errors = [], []
+
+    def reader(index):
+        session = requests.Session()
+        url = f"{base}/kpis" if index % 2 == 0 else f"{base}/scores"
+        local = []
+        while not stop.is_set():
+            start = time.perf_counter()
+            response = session.get(url)
+            local.append(time.perf_counter() - start)
+            if response.status_code != 200:
+                errors.append(response.status_code)
+        latencies.extend(local)
+
+    def writer():
+        session = requests.Session()
+        version = 0
+        while not stop.is_set():
+            version += 1
+            # Every tenth KPI gets new values
+            payload = api_records(KPI_COUNT, seed=version)[::10]
+            response = session.patch(f"{base}/kpis", data=json.dumps(payload),
+                                     headers={"Content-Type": "application/json"})
+            if response.status_code != 200:
+                errors.append(response.status_code)
+            time.sleep(0.05)
+
+    threads = [threading.Thread(target=reader, args=(i,)) for i in range(clients)] + [threading.Thread(target=writer)]
+    try:
+        for t in threads:
+            t.start()
+        time.sleep(seconds)
+        stop.set()
+        for t in threads:
+            t.join()
+    finally:
+        server.terminate()
+        server.wait()
+    return latencies, errors
+
+if __name__ == "__main__":
+    clients = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 5
+    print(f"{clients} clients, {seconds:.0f}s per run, {os.cpu_count()} CPU(s)")
+    for workers in WORKER_COUNTS:
+        latencies, errors = run(workers, clients, seconds)
+        q = statistics.quantiles(latencies, n=100)
+        print(f"{workers} worker(s): {len(latencies) / seconds:8.1f} req/s  "
+              f"p50 {q[49] * 1000:7.2f} ms  p99 {q[98] * 1000:7.2f} ms  errors {len(errors)}")
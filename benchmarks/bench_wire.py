@@ -0,0 +1,43 @@
+# Wire format benchmark for GET /api/kpis: the per-record JSON body versus the
+# columnar encoding from kpi_wire. Reports body size (raw and gzip), server-side
+# encode time and dashboard-side decode time, both to NumPy columns and to the
+# (kpi_name, rate, target, poids, obj, real, score) tuples app.py renders.
+# Usage: python benchmarks/bench_wire.py [rows ...]
+import gzip
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from kpi_wire import encode_columnar, decode_columnar, decode_kpi_rows, record_to_kpi  # noqa: E402
+from synthetic import api_records  # noqa: E402
+
+# The dashboard's JSON decoding (kpi_wire.record_to_kpi per record)
+def json_rows(body):
+    return [record_to_kpi(item) for item in json.loads(body)]
+
+def best_of(fn, arg, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(arg)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:]] or [100, 10_000, 100_000]
+    print(f"{'rows':>8} {'format':<9} {'bytes':>11} {'gzip':>10} {'encode ms':>10} {'decode ms':>10} {'to rows ms':>11}")
+    for n in sizes:
+        records = api_records(n)
+        json_body = json.dumps(records).encode("utf-8")
+        columnar_body = encode_columnar(records)
+        assert decode_kpi_rows(columnar_body) == json_rows(json_body)
+        results = (
+            ("json", json_body, lambda r: json.dumps(r).encode("utf-8"), json.loads, json_rows),
+            ("columnar", columnar_body, encode_columnar, decode_columnar, decode_kpi_rows),
+        )
+        for name, body, encode, decode, to_rows in results:
+            print(f"{n:>8} {name:<9} {len(body):>11,} {len(gzip.compress(body)):>10,} "
+                  f"{best_of(encode, records):>10.2f} {best_of(decode, body):>10.2f} {best_of(to_rows, body):>11.2f}")
@@ -0,0 +1,179 @@
+# Benchmark suite for the ingest, API and dashboard hot paths on synthetic data.
+# Runs offline against a scratch database and writes the timings as JSON so
+# runs can be compared over time.
+# Usage: python benchmarks/run_suite.py [--scales 100,1000,10000] [--repeat 5]
+#                                       [--output results.json] [--compare previous.json]
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from importlib import metadata
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# The modules below read their database paths at import time
+SCRATCH_DIR = tempfile.mkdtemp(prefix="kpi_suite_")
+os.environ["KPI_DB_PATH"] = os.path.join(SCRATCH_DIR, "kpi_database.db")
+os.environ["KPI_REGION_DIR"] = os.path.join(SCRATCH_DIR, "regions")
+
+import api  # noqa: E402
+import kpi_gauges  # noqa: E402
+import kpi_loader  # noqa: E402
+from kpi_layout import layout_pages  # noqa: E402
+from kpi_wire import COLUMNAR_MIMETYPE, decode_kpi_rows, record_to_kpi  # noqa: E402
+from synthetic import api_records, write_kpi_json  # noqa: E402
+
+DEFAULT_SCALES = [100, 1_000, 10_000]
+MAX_COLS = 6
+ROWS_PER_PAGE = 3
+
+# Time `repeat` runs of fn after one untimed warm-up run, so lazy imports and
+# first-call caches do not land in the first repetition
+def measure(fn, repeat, setup=None):
+    if setup:
+        setup()
+    fn()
+    timings = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return {
+        "min_ms": min(timings) * 1000,
+        "median_ms": statistics.median(timings) * 1000,
+        "mean_ms": statistics.fmean(timings) * 1000,
+        "stdev_ms": statistics.stdev(timings) * 1000 if len(timings) > 1 else 0.0,
+        "repeat": repeat,
+    }
+
+def quiet(fn):
+    def wrapper():
+        with contextlib.redirect_stdout(io.StringIO()):
+            return fn()
+    return wrapper
+
+# What app.py does between receiving KPIs and drawing: parse and clean the JSON,
+# build the row tuples, lay out the first page and compute its gauge values
+def prepare_dashboard(json_file):
+    kpi_loader._load_kpi_frame.cache_clear()
+    kpi_data = kpi_loader.frame_to_rows(kpi_loader.load_kpi_frame(json_file))
+    page = layout_pages([kpi[0] for kpi in kpi_data], MAX_COLS, ROWS_PER_PAGE)[0]
+    indexes = [cell["index"] for row in page for cell in row["cells"] if cell and cell["index"] is not None]
+    values, colors = kpi_loader.gauge_arrays([kpi_data[i][6] for i in indexes], [kpi_data[i][3] for i in indexes])
+    return kpi_data, [(kpi_data[i][0], float(v), str(c), kpi_data[i][6]) for i, v, c in zip(indexes, values, colors)]
+
+# Figure construction plus the JSON serialization Streamlit does for each chart
+def build_plotly_gauges(gauges):
+    for _, value, color, score in gauges:
+        kpi_gauges.kpi_gauge_figure(value, color, score).to_json()
+
+def build_svg_gauges(gauges):
+    kpi_gauges.kpi_gauge_svg.cache_clear()
+    for _, value, color, score in gauges:
+        kpi_gauges.kpi_gauge_svg(value, color, score)
+
+def run_scale(n, repeat):
+    client = api.app.test_client()
+    json_file = write_kpi_json(os.path.join(SCRATCH_DIR, f"kpi_data_{n}.json"), n)
+    payload = json.dumps(api_records(n))
+    headers = {"Content-Type": "application/json"}
+    results = {}
+
+    results["ingest.load_initial_data"] = measure(quiet(lambda: api.load_initial_data(json_file, force=True)), repeat)
+
+    def post():
+        response = client.post("/api/kpis", data=payload, headers=headers)
+        assert response.status_code == 200, response.data
+    results["api.post_kpis"] = measure(post, repeat)
+
+    # Cold: a write just invalidated the payload cache; warm: served from it
+    touch = lambda: client.patch("/api/kpis", data=json.dumps([{**api_records(1)[0], "rate": time.time()}]),  # noqa: E731
+                                 headers=headers)
+    results["api.get_kpis.cold"] = measure(lambda: client.get("/api/kpis"), repeat, setup=touch)
+    results["api.get_kpis.warm"] = measure(lambda: client.get("/api/kpis"), repeat)
+    results["api.get_kpis.columnar"] = measure(lambda: client.get("/api/kpis", headers={"Accept": COLUMNAR_MIMETYPE}),
+                                               repeat)
+    json_body = client.get("/api/kpis").data
+    columnar_body = client.get("/api/kpis", headers={"Accept": COLUMNAR_MIMETYPE}).data
+    # The dashboard's decoding into row tuples: kpi_wire.record_to_kpi per JSON record
+    results["app.decode_json"] = measure(lambda: [record_to_kpi(item) for item in json.loads(json_body)], repeat)
+    results["app.decode_columnar"] = measure(lambda: decode_kpi_rows(columnar_body), repeat)
+
+    results["app.prepare_dashboard"] = measure(lambda: prepare_dashboard(json_file), repeat)
+    _, gauges = prepare_dashboard(json_file)
+    results["render.plotly_gauges"] = measure(lambda: build_plotly_gauges(gauges), repeat)
+    results["render.grid_figure"] = measure(lambda: kpi_gauges.gauge_grid_figure(gauges, MAX_COLS).to_json(), repeat)
+    results["render.svg_gauges"] = measure(lambda: build_svg_gauges(gauges), repeat)
+    for result in results.values():
+        result["rows"] = n
+    results["render.plotly_gauges"]["gauges"] = len(gauges)
+    return results
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True, text=True,
+                                check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    versions = {}
+    for package in ("flask", "numpy", "pandas", "plotly"):
+        try:
+            versions[package] = metadata.version(package)
+        except metadata.PackageNotFoundError:
+            versions[package] = None
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "sqlite": api.sqlite3.sqlite_version,
+        "packages": versions,
+    }
+
+# Median-time ratio against a previous results file (> 1 means slower now)
+def compare(results, previous_file):
+    with open(previous_file, encoding="utf-8") as f:
+        previous = json.load(f)["results"]
+    print(f"\nCompared with {previous_file} (median, current / previous):")
+    for scale, cases in results.items():
+        for case, result in cases.items():
+            before = previous.get(scale, {}).get(case)
+            if before and before["median_ms"]:
+                print(f"{scale:>8} {case:<28} {result['median_ms'] / before['median_ms']:6.2f}x")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the KPI dashboard benchmark suite")
+    parser.add_argument("--scales", default=",".join(str(n) for n in DEFAULT_SCALES),
+                        help="comma-separated KPI counts")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="results file (default benchmarks/results/suite-<timestamp>.json)")
+    parser.add_argument("--compare", help="previous results file to compare against")
+    args = parser.parse_args()
+
+    started = datetime.now(timezone.utc)
+    results = {}
+    for n in (int(scale) for scale in args.scales.split(",")):
+        results[str(n)] = run_scale(n, args.repeat)
+        for case, result in results[str(n)].items():
+            print(f"{n:>8} {case:<28} median {result['median_ms']:10.2f} ms  min {result['min_ms']:10.2f} ms")
+
+    output = args.output or os.path.join(ROOT, "benchmarks", "results",
+                                         f"suite-{started.strftime('%Y%m%dT%H%M%SZ')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump({"started": started.strftime("%Y-%m-%dT%H:%M:%SZ"), "environment": environment(),
+                   "results": results}, f, indent=2)
+    print(f"Results written to {output}")
+    if args.compare:
+        compare(results, args.compare)
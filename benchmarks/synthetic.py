@@ -0,0 +1,55 @@
+# Deterministic synthetic KPI data for the benchmarks, shaped like kpi_data.json
+# (source records), the API's KPI records, kpi_store rows or kpi_history points.
+# Same `n` and `seed`, same data; KPI names depend on the position only, so
+# another seed gives new values for the same KPIs.
+import json
+import random
+
+GROUPS = ["Commercial", "Technique", "Stratégique", "Financier"]
+KPI_FIELDS = ("kpi_name", "rate", "target", "poids", "obj", "real", "score")
+SUBCATEGORIES = ["Mobile", "Fixe", "Entreprise", "Data", "Roaming", "Terminaux"]
+
+def synthetic_records(n, seed=2025):
+    rng = random.Random(seed)
+    for i in range(n):
+        poids = round(rng.choice((0.01, 0.02, 0.03, 0.04, 0.05)), 2)
+        objectif = rng.randint(100, 100_000)
+        rate = rng.uniform(0, 1.5)
+        yield {
+            # Every tenth KPI has no "Group - KPI" name and is named from Column2/Column3
+            "Objectifs": f"{GROUPS[i % len(GROUPS)]} - KPI {i}" if i % 10 else None,
+            "Column2": SUBCATEGORIES[i % len(SUBCATEGORIES)],
+            "Column3": f"KPI {i}",
+            "poids": poids,
+            "OBJECTIF 2025": objectif,
+            "Réalisation 2025": round(objectif * rate, 2),
+            "Taux de réalisation": rate,
+            "score": None if i % 97 == 0 else poids * rate,
+        }
+
+# kpi_store rows: (kpi_name, rate, target, poids, obj, real, score) tuples, as
+# kpi_loader derives them from the source records
+def synthetic_rows(n, seed=2025):
+    for record in synthetic_records(n, seed):
+        yield (record["Objectifs"] or f"{record['Column2']} - {record['Column3']}", record["Taux de réalisation"] * 100,
+               float(record["OBJECTIF 2025"]), record["poids"], float(record["OBJECTIF 2025"]),
+               record["Réalisation 2025"], record["score"])
+
+# Records as accepted by POST/PATCH /api/kpis
+def api_records(n, seed=2025):
+    return [dict(zip(KPI_FIELDS, row)) for row in synthetic_rows(n, seed)]
+
+# kpi_history points (kpi_name, ts, period, rate, score): `points_per_kpi` values
+# per KPI, `step` seconds apart from `start`
+def synthetic_history(kpi_count, points_per_kpi, start, step, seed=2025):
+    names = [row[0] for row in synthetic_rows(kpi_count, seed)]
+    rng = random.Random(seed)
+    for name in names:
+        for i in range(points_per_kpi):
+            rate = rng.uniform(0, 150)
+            yield (name, start + i * step, "2025", rate, rate / 1000)
+
+def write_kpi_json(path, n, seed=2025):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(list(synthetic_records(n, seed)), f, ensure_ascii=False)
+    return path
@@ -0,0 +1,93 @@
+import argparse
+import zipfile
+from itertools import chain
+from kpi_loader import source_record_to_row, MissingColumnsError, NUMERIC_COLUMNS
+from kpi_store import region_connection, bulk_replace_kpis, DEFAULT_REGION
+
+# Not an .xlsx workbook openpyxl can open (not a zip, or a zip without the workbook parts)
+class InvalidWorkbookError(ValueError):
+    pass
+
+class UnknownSheetError(LookupError):
+    def __init__(self, sheet, sheetnames):
+        self.sheet = sheet
+        super().__init__(f"Unknown worksheet {sheet!r}, expected one of: {', '.join(sheetnames)}")
+
+# Label columns of the score workbook: the group ("Objectifs"), its sub-group and
+# the KPI itself. Group and sub-group are merged cells, so only the first row of
+# each block carries a value and they are carried forward while reading.
+GROUP_HEADER = "Objectifs"
+
+def _clean(value):
+    return value.strip() if isinstance(value, str) else value
+
+def _group_title(value):
+    value = _clean(value)
+    return value[:1].upper() + value[1:] if value else value
+
+# Header row -> {column name: index}; the two unnamed columns after "Objectifs"
+# are the sub-group (Column2) and KPI (Column3) labels
+def _header_indexes(header):
+    header = [_clean(cell) for cell in header]
+    indexes = {name: idx for idx, name in enumerate(header) if isinstance(name, str)}
+    if GROUP_HEADER in indexes:
+        group_idx = indexes[GROUP_HEADER]
+        indexes.setdefault("Column2", group_idx + 1)
+        indexes.setdefault("Column3", group_idx + 2)
+    missing_columns = [col for col in [GROUP_HEADER] + NUMERIC_COLUMNS if col not in indexes]
+    if missing_columns:
+        raise MissingColumnsError(missing_columns, source="Excel sheet")
+    return indexes
+
+# Stream kpi_data.json-shaped records from an .xlsx workbook (path or file object).
+# The sheet is read in read-only mode one row at a time, so memory stays flat
+# regardless of the number of rows.
+def iter_xlsx_records(source, sheet=None):
+    from openpyxl import load_workbook
+    from openpyxl.utils.exceptions import InvalidFileException
+
+    try:
+        workbook = load_workbook(source, read_only=True, data_only=True)
+    except (zipfile.BadZipFile, KeyError, InvalidFileException) as e:
+        raise InvalidWorkbookError(f"Not a valid .xlsx workbook: {e}") from e
+    try:
+        if sheet and sheet not in workbook.sheetnames:
+            raise UnknownSheetError(sheet, workbook.sheetnames)
+        worksheet = workbook[sheet] if sheet else workbook.worksheets[0]
+        rows = worksheet.iter_rows(values_only=True)
+        indexes = _header_indexes(next(rows, ()))
+        group = column2 = None
+        for row in rows:
+            values = {name: _clean(row[idx]) if idx < len(row) else None for name, idx in indexes.items()}
+            if values[GROUP_HEADER]:
+                group, column2 = _group_title(values[GROUP_HEADER]), None
+            if values["Column2"]:
+                column2 = values["Column2"]
+            kpi = values["Column3"] or values["Column2"]
+            if not kpi:
+                continue
+            record = {name: values[name] for name in NUMERIC_COLUMNS}
+            record.update({"Objectifs": f"{group} - {kpi}" if group else None, "Column2": column2, "Column3": kpi})
+            yield record
+    finally:
+        workbook.close()
+
+# Import a workbook into a region through the bulk ingest path; returns the row count.
+# The workbook, sheet and header are checked before a new region's database is created.
+def import_xlsx(source, region=DEFAULT_REGION, sheet=None):
+    records = iter_xlsx_records(source, sheet)
+    try:
+        first = next(records, None)
+        rows = (source_record_to_row(record) for record in chain([first] if first else [], records))
+        return bulk_replace_kpis(region_connection(region, create=True), (row for row in rows if row is not None))
+    finally:
+        records.close()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Import a KPI score workbook (.xlsx) into the KPI database")
+    parser.add_argument("workbook", help="path to the .xlsx file, e.g. Application-score.xlsx")
+    parser.add_argument("--region", default=DEFAULT_REGION, help="region to replace (default: %(default)s)")
+    parser.add_argument("--sheet", help="worksheet name (default: first sheet)")
+    args = parser.parse_args()
+    count = import_xlsx(args.workbook, args.region, args.sheet)
+    print(f"Loaded {count} records from {args.workbook} into database (region {args.region})")
@@ -0,0 +1,185 @@
+import math
+import threading
+from functools import lru_cache
+import plotly.graph_objects as go
+
+GAUGE_HEIGHT = 120
+GAUGE_WIDTH = 110
+GAUGE_FONT = "Arial, sans-serif"
+GAUGE_MARGIN = dict(l=2, r=2, t=15, b=5)
+REGIONAL_COLOR = "#f59e0b"  # Match the existing gauge bar color
+
+def score_label(score):
+    return f"{score * 100:.1f}%" if score is not None else "0%"
+
+def _kpi_indicator(value, color, domain=None):
+    return go.Indicator(
+        mode="gauge+number",
+        value=value,
+        domain=domain or {'x': [0, 1], 'y': [0, 1]},
+        gauge={'shape': "angular",
+               'axis': {'range': [0, 100], 'tickvals': [0, 100], 'ticktext': ['0%', '100%']},
+               'bar': {'color': color, 'thickness': 0.3},
+               'bgcolor': "white",
+               'borderwidth': 2,
+               'bordercolor': "#2d3748"},
+        number={'valueformat': ".1f", 'suffix': "%", 'font': {'size': 20, 'color': color, 'family': GAUGE_FONT, 'weight': 'bold'}},
+    )
+
+def _build_kpi_template():
+    fig = go.Figure(_kpi_indicator(0, "#dc143c"))
+    fig.add_annotation(
+        text="0%",
+        xref="paper", yref="paper",
+        x=0.5, y=0.5,
+        showarrow=False,
+        font=dict(size=20, color="#dc143c", family=GAUGE_FONT, weight="bold")
+    )
+    fig.update_layout(
+        height=GAUGE_HEIGHT,
+        width=GAUGE_WIDTH,
+        margin=GAUGE_MARGIN,
+        paper_bgcolor='rgba(0,0,0,0)',
+        plot_bgcolor='rgba(0,0,0,0)',
+        showlegend=False
+    )
+    return fig
+
+_templates = threading.local()
+
+# Single KPI gauge. The figure is one per-thread template whose value, colors and
+# score label are updated in place, so it must be rendered (serialized) before
+# the next call on the same thread.
+def kpi_gauge_figure(value, color, score):
+    fig = getattr(_templates, "kpi", None)
+    if fig is None:
+        fig = _templates.kpi = _build_kpi_template()
+    with fig.batch_update():
+        indicator = fig.data[0]
+        indicator.value = value
+        indicator.gauge.bar.color = color
+        indicator.number.font.color = color
+        annotation = fig.layout.annotations[0]
+        annotation.text = score_label(score)
+        annotation.font.color = color
+    return fig
+
+def _regional_indicator(regional_score, domain=None):
+    return go.Indicator(
+        mode="gauge",  # Single score via annotation
+        value=regional_score,
+        domain=domain or {'x': [0, 1], 'y': [0, 1]},
+        gauge={'shape': "angular",
+               'axis': {'range': [0, 100], 'visible': False},
+               'bar': {'color': REGIONAL_COLOR, 'thickness': 0.6},
+               'bgcolor': "white",
+               'borderwidth': 2,
+               'bordercolor': "#131414"},
+    )
+
+def regional_gauge_figure(regional_score):
+    fig_score = go.Figure(_regional_indicator(regional_score))
+    fig_score.add_annotation(
+        text=f"{regional_score:.2f}%",
+        xref="paper", yref="paper",
+        x=0.5, y=0.5,
+        showarrow=False,
+        font=dict(size=20, color=REGIONAL_COLOR, family=GAUGE_FONT, weight="bold")
+    )
+    fig_score.update_layout(
+        height=GAUGE_HEIGHT,
+        width=GAUGE_WIDTH,
+        margin=GAUGE_MARGIN,
+        paper_bgcolor='rgba(0,0,0,0)',
+        plot_bgcolor='rgba(0,0,0,0)',
+        showlegend=False
+    )
+    return fig_score
+
+# All gauges in one multi-trace figure laid out on a `max_cols` grid.
+# `gauges` is a list of (label, gauge_value, color, score) tuples, one per cell;
+# None leaves a cell empty. With `regional_score` the grid's last cell holds
+# the regional score gauge.
+def gauge_grid_figure(gauges, max_cols=6, regional_score=None):
+    cell_count = len(gauges) + (1 if regional_score is not None else 0)
+    n_rows = max(1, math.ceil(cell_count / max_cols))
+    cells = list(gauges) + [None] * (n_rows * max_cols - len(gauges))
+    traces, annotations = [], []
+    for idx, gauge in enumerate(cells):
+        row, col = divmod(idx, max_cols)
+        x0, x1 = col / max_cols, (col + 1) / max_cols
+        y1 = 1 - row / n_rows
+        y0 = y1 - 1 / n_rows
+        pad_x, pad_y = 0.01, 0.2 / n_rows
+        domain = {'x': [x0 + pad_x, x1 - pad_x], 'y': [y0 + pad_y / 4, y1 - pad_y]}
+        if regional_score is not None and idx == len(cells) - 1:
+            traces.append(_regional_indicator(regional_score, domain))
+            annotations.append(dict(text="Score de la Région", x=(x0 + x1) / 2, y=y1, xref="paper", yref="paper",
+                                    showarrow=False, yanchor="top", font=dict(size=12, color="#1a202c", family=GAUGE_FONT)))
+            annotations.append(dict(text=f"{regional_score:.2f}%", x=(x0 + x1) / 2, y=y0 + (y1 - y0) * 0.45,
+                                    xref="paper", yref="paper", showarrow=False,
+                                    font=dict(size=16, color=REGIONAL_COLOR, family=GAUGE_FONT, weight="bold")))
+            continue
+        if gauge is None:
+            continue
+        label, value, color, score = gauge
+        trace = _kpi_indicator(value, color, domain)
+        trace.number.font.size = 16
+        traces.append(trace)
+        annotations.append(dict(text=label, x=(x0 + x1) / 2, y=y1, xref="paper", yref="paper", showarrow=False,
+                                yanchor="top", font=dict(size=12, color="#1a202c", family=GAUGE_FONT)))
+        annotations.append(dict(text=score_label(score), x=(x0 + x1) / 2, y=y0 + (y1 - y0) * 0.45, xref="paper", yref="paper",
+                                showarrow=False, font=dict(size=16, color=color, family=GAUGE_FONT, weight="bold")))
+    fig = go.Figure(data=traces)
+    fig.update_layout(
+        height=GAUGE_HEIGHT * 1.5 * n_rows,
+        margin=GAUGE_MARGIN,
+        annotations=annotations,
+        paper_bgcolor='rgba(0,0,0,0)',
+        plot_bgcolor='rgba(0,0,0,0)',
+        showlegend=False
+    )
+    return fig
+
+# Arc length of the r=40 half circle used by the SVG gauges
+_ARC_LENGTH = math.pi * 40
+
+# Lightweight SVG gauge (no Plotly); markup is memoized per distinct value
+@lru_cache(maxsize=1024)
+def kpi_gauge_svg(value, color, score):
+    filled = max(0.0, min(value, 100.0)) / 100 * _ARC_LENGTH
+    return (
+        f'<svg viewBox="0 0 100 62" width="{GAUGE_WIDTH}" height="{GAUGE_HEIGHT * 0.6:.0f}" role="img">'
+        f'<path d="M10,52 A40,40 0 0 1 90,52" fill="none" stroke="#e2e8f0" stroke-width="10"/>'
+        f'<path d="M10,52 A40,40 0 0 1 90,52" fill="none" stroke="{color}" stroke-width="10" '
+        f'stroke-dasharray="{filled:.2f} {_ARC_LENGTH:.2f}"/>'
+        f'<text x="50" y="44" text-anchor="middle" font-family="{GAUGE_FONT}" font-size="13" font-weight="bold" '
+        f'fill="{color}">{score_label(score)}</text>'
+        f'<text x="50" y="61" text-anchor="middle" font-family="{GAUGE_FONT}" font-size="10" font-weight="bold" '
+        f'fill="{color}">{value:.1f}%</text>'
+        '</svg>'
+    )
+
+SPARKLINE_WIDTH = 100
+SPARKLINE_HEIGHT = 24
+
+# Small SVG trend line for a KPI's recent rollup values (None gaps are skipped);
+# markup is memoized per distinct series
+@lru_cache(maxsize=1024)
+def sparkline_svg(values, color="#2563eb"):
+    points = [(i, value) for i, value in enumerate(values) if value is not None]
+    if len(points) < 2:
+        return ""
+    low = min(value for _, value in points)
+    span = (max(value for _, value in points) - low) or 1
+    step = (SPARKLINE_WIDTH - 4) / (len(values) - 1)
+    coords = " ".join(f"{2 + i * step:.1f},{SPARKLINE_HEIGHT - 2 - (value - low) / span * (SPARKLINE_HEIGHT - 4):.1f}"
+                      for i, value in points)
+    last_x, last_y = coords.rsplit(" ", 1)[-1].split(",")
+    return (
+        f'<svg viewBox="0 0 {SPARKLINE_WIDTH} {SPARKLINE_HEIGHT}" width="{GAUGE_WIDTH}" '
+        f'height="{SPARKLINE_HEIGHT}" role="img">'
+        f'<polyline points="{coords}" fill="none" stroke="{color}" stroke-width="1.5" stroke-linejoin="round"/>'
+        f'<circle cx="{last_x}" cy="{last_y}" r="2" fill="{color}"/>'
+        '</svg>'
+    )
@@ -0,0 +1,65 @@
+import html
+import math
+
+# Cell kinds. The regional score is told apart by its kind, never by its group:
+# KPI names (and so group titles) come from API clients.
+KPI_SLOT = "kpi"
+REGION_SLOT = "region"
+
+# "Commercial - M prp Net" -> ("Commercial", "M prp Net")
+def split_kpi_name(kpi_name):
+    parts = kpi_name.split(" - ", 1)  # Split at the first hyphen
+    group_title = parts[0]
+    subcategory = parts[1] if len(parts) > 1 else kpi_name
+    return group_title, subcategory
+
+# Group bands for one row of cells: consecutive cells of the same group are
+# merged into a single (group_title, start_col, span) band
+def row_bands(cells):
+    bands = []
+    for col, cell in enumerate(cells):
+        group_title = cell["group"] if cell else None
+        if bands and bands[-1][0] == group_title:
+            title, start, span = bands[-1]
+            bands[-1] = (title, start, span + 1)
+        else:
+            bands.append((group_title, col, 1))
+    return bands
+
+# Lay out KPI names on pages of `rows_per_page` x `max_cols` cells in one pass.
+# The last cell of each page's last row is reserved for the regional score.
+# Returns a list of pages; each page is a list of rows with "cells" (a dict with
+# the cell kind, KPI index, group and subcategory, or None) and "bands". The
+# region slot has no index or group, so it shares the empty bands.
+def layout_pages(kpi_names, max_cols=6, rows_per_page=3, with_region=True):
+    capacity = max_cols * rows_per_page - (1 if with_region else 0)
+    page_count = max(1, math.ceil(len(kpi_names) / capacity))
+    pages = []
+    for page_idx in range(page_count):
+        names = kpi_names[page_idx * capacity:(page_idx + 1) * capacity]
+        cells = []
+        for offset, kpi_name in enumerate(names):
+            group_title, subcategory = split_kpi_name(kpi_name)
+            cells.append({"kind": KPI_SLOT, "index": page_idx * capacity + offset, "group": group_title,
+                          "subcategory": subcategory})
+        row_count = max(1, math.ceil((len(cells) + (1 if with_region else 0)) / max_cols))
+        cells += [None] * (row_count * max_cols - len(cells))
+        if with_region:
+            cells[-1] = {"kind": REGION_SLOT, "index": None, "group": None, "subcategory": None}
+        rows = []
+        for start in range(0, len(cells), max_cols):
+            row_cells = cells[start:start + max_cols]
+            rows.append({"cells": row_cells, "bands": row_bands(row_cells)})
+        pages.append(rows)
+    return pages
+
+# HTML for a row's group bands, each band as wide as the gauges it spans
+def group_bands_html(bands, max_cols):
+    parts = []
+    for group_title, start, span in bands:
+        width = span / max_cols * 100
+        if group_title is None:
+            parts.append(f"<div class='group-band empty' style='width:{width:.2f}%'></div>")
+        else:
+            parts.append(f"<div class='group-band' style='width:{width:.2f}%'>{html.escape(group_title)}</div>")
+    return "<div class='group-bands'>" + "".join(parts) + "</div>"
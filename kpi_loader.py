@@ -0,0 +1,168 @@
+import os
+import json
+import math
+from functools import lru_cache
+
+# numpy/pandas are imported inside the DataFrame helpers: the API only uses the
+# streaming functions and should not pay for them at startup.
+
+REQUIRED_COLUMNS = ["Objectifs", "Taux de réalisation", "OBJECTIF 2025", "poids", "Réalisation 2025", "score"]
+LABEL_COLUMNS = ["Column2", "Column3"]
+NUMERIC_COLUMNS = ["Taux de réalisation", "OBJECTIF 2025", "Réalisation 2025", "poids", "score"]
+ROW_COLUMNS = ["Objectifs", "Taux de réalisation", "OBJECTIF 2025", "poids", "OBJECTIF 2025", "Réalisation 2025", "score"]
+
+# Characters read per step by the streaming JSON parser
+JSON_READ_SIZE = 1 << 16
+JSON_DELIMITERS = ",] \t\r\n"
+
+# Gauge colors by score/poids ratio: reached, close (>= 80%), behind
+GAUGE_COLORS = ("#17b248", "#ffa500", "#dc143c")
+
+class MissingColumnsError(ValueError):
+    def __init__(self, missing_columns, source="JSON"):
+        self.missing_columns = missing_columns
+        super().__init__(f"Missing required columns in {source}: {', '.join(missing_columns)}")
+
+# Gauge fill (score as % of poids, capped at 100) and color for whole columns at once
+def gauge_arrays(scores, poids):
+    import numpy as np
+
+    scores = np.asarray(scores, dtype=float)
+    poids = np.asarray(poids, dtype=float)
+    valid = np.isfinite(scores) & np.isfinite(poids) & (poids != 0)
+    ratio = np.divide(scores * 100, poids, out=np.zeros_like(scores), where=valid)
+    values = np.minimum(ratio, 100)
+    colors = np.select([values >= 100, values >= 80], GAUGE_COLORS[:2], GAUGE_COLORS[2])
+    return values, colors
+
+# Turn raw kpi_data.json records into a typed KPI frame: numeric columns coerced
+# (non-finite values become NaN), rows without poids dropped, rate in percent, missing Objectifs rebuilt from
+# Column2/Column3, plus gauge_value/gauge_color columns
+def prepare_kpi_frame(records):
+    import numpy as np
+    import pandas as pd
+
+    df = pd.DataFrame(records)
+    missing_columns = [col for col in REQUIRED_COLUMNS if col not in df.columns]
+    if missing_columns:
+        raise MissingColumnsError(missing_columns)
+    df = df.reindex(columns=REQUIRED_COLUMNS + LABEL_COLUMNS)
+    df[NUMERIC_COLUMNS] = df[NUMERIC_COLUMNS].apply(pd.to_numeric, errors="coerce").replace([np.inf, -np.inf], np.nan)
+    df = df.dropna(subset=["poids"]).reset_index(drop=True)
+    df["Taux de réalisation"] = df["Taux de réalisation"] * 100
+    fallback = df["Column2"].fillna("Unknown").astype(str) + " - " + df["Column3"].fillna("Unknown").astype(str)
+    df["Objectifs"] = df["Objectifs"].fillna(fallback)
+    df["gauge_value"], df["gauge_color"] = gauge_arrays(df["score"], df["poids"])
+    return df
+
+def read_kpi_json(json_file):
+    with open(json_file, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+@lru_cache(maxsize=4)
+def _load_kpi_frame(json_file, mtime_ns, size):
+    return prepare_kpi_frame(read_kpi_json(json_file))
+
+# Parsed KPI frame for `json_file`, reused until the file's mtime or size changes.
+# The frame is shared between callers and must be treated as read-only.
+def load_kpi_frame(json_file):
+    stat = os.stat(json_file)
+    return _load_kpi_frame(os.path.abspath(json_file), stat.st_mtime_ns, stat.st_size)
+
+# KPI frame -> (kpi_name, rate, target, poids, obj, real, score) tuples, NaN as None
+def frame_to_rows(df):
+    values = df[ROW_COLUMNS].astype(object)
+    return [tuple(row) for row in values.where(values.notna(), None).values.tolist()]
+
+# Numbers as floats; non-numbers, NaN and +/-Infinity (json accepts both) as None
+def _to_float(value):
+    try:
+        value = float(value)
+    except (TypeError, ValueError, OverflowError):
+        return None
+    return value if math.isfinite(value) else None
+
+def _is_missing(value):
+    return value is None or (isinstance(value, float) and math.isnan(value))
+
+# One source record -> DB row without building a DataFrame, for streaming
+# importers. Applies the same rules as prepare_kpi_frame and returns None for
+# records without poids.
+def source_record_to_row(record):
+    poids = _to_float(record.get("poids"))
+    if poids is None:
+        return None
+    kpi_name = record.get("Objectifs")
+    if _is_missing(kpi_name):
+        column2, column3 = record.get("Column2"), record.get("Column3")
+        kpi_name = f"{'Unknown' if _is_missing(column2) else column2} - {'Unknown' if _is_missing(column3) else column3}"
+    rate = _to_float(record.get("Taux de réalisation"))
+    target = _to_float(record.get("OBJECTIF 2025"))
+    return (kpi_name, rate * 100 if rate is not None else None, target, poids, target,
+            _to_float(record.get("Réalisation 2025")), _to_float(record.get("score")))
+
+# Incrementally parse a top-level JSON array from a text file object, yielding one
+# element at a time. Only the current element and one read buffer are held in memory.
+# Like json.load, only whitespace may follow the array.
+def iter_json_array(f, read_size=JSON_READ_SIZE):
+    decoder = json.JSONDecoder()
+    buffer, pos, eof = "", 0, False
+    expect = "["  # "[", then "value" / "," alternately, until "]", then "end"
+    while True:
+        while pos < len(buffer) and buffer[pos] in " \t\r\n":
+            pos += 1
+        if pos == len(buffer):
+            if eof:
+                if expect == "end":
+                    return
+                raise ValueError("Unexpected end of JSON data")
+            chunk = f.read(read_size)
+            buffer, pos, eof = buffer[pos:] + chunk, 0, not chunk
+            continue
+        char = buffer[pos]
+        if expect == "end":
+            raise ValueError(f"Unexpected data after the JSON array: {char!r}")
+        elif expect == "[":
+            if char != "[":
+                raise ValueError("Expected a JSON array of KPI records")
+            pos, expect = pos + 1, "first"
+        elif expect in (",", "first") and char == "]":
+            pos, expect = pos + 1, "end"
+        elif expect == ",":
+            if char != ",":
+                raise ValueError(f"Expected ',' or ']' in JSON array, got {char!r}")
+            pos, expect = pos + 1, "value"
+        else:
+            try:
+                value, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                end = None
+            # An element not followed by a delimiter yet may be cut short (e.g. a number)
+            if end is None or (not eof and (end == len(buffer) or buffer[end] not in JSON_DELIMITERS)):
+                if eof:
+                    raise ValueError("Invalid JSON element in KPI array")
+                chunk = f.read(read_size)
+                buffer, pos, eof = buffer[pos:] + chunk, 0, not chunk
+                continue
+            yield value
+            pos, expect = end, ","
+            if pos > read_size:
+                buffer, pos = buffer[pos:], 0
+
+# Stream kpi_data.json as DB rows: each record is validated and coerced on its
+# own (records without poids are skipped). Raises MissingColumnsError at the end
+# when a required column never appeared; inside bulk_replace_kpis that rolls the
+# whole load back.
+def iter_json_rows(json_file):
+    seen_columns = set()
+    with open(json_file, 'r', encoding='utf-8') as f:
+        for idx, record in enumerate(iter_json_array(f)):
+            if not isinstance(record, dict):
+                raise ValueError(f"KPI record {idx} is not a JSON object")
+            seen_columns.update(record)
+            row = source_record_to_row(record)
+            if row is not None:
+                yield row
+    missing_columns = [col for col in REQUIRED_COLUMNS if col not in seen_columns]
+    if missing_columns:
+        raise MissingColumnsError(missing_columns)
@@ -0,0 +1,120 @@
+import functools
+import threading
+import time
+from contextlib import contextmanager
+
+# In-process instrumentation: counters and timing histograms kept in plain dicts
+# behind one lock (a few microseconds per observation, cheap enough to stay on).
+# Values are per process; under gunicorn each worker reports its own.
+TIMING_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+METRIC_HELP = {
+    "kpi_db_init_seconds": "Time spent opening and migrating a database (init_db)",
+    "kpi_db_lock_wait_seconds": "Time spent waiting for the SQLite write lock (BEGIN IMMEDIATE)",
+    "kpi_db_write_seconds": "Time spent in write transactions",
+    "kpi_db_query_seconds": "Time spent in read queries",
+    "kpi_db_busy_total": "Requests that failed because the database stayed locked",
+    "kpi_rows_ingested_total": "KPI rows written to SQLite",
+    "kpi_cache_requests_total": "Serialized payload cache lookups",
+    "kpi_serialize_seconds": "Time spent serializing API payloads",
+    "kpi_http_request_seconds": "API request latency",
+    "kpi_http_responses_total": "API responses by status code",
+    "kpi_stream_rejected_total": "Event stream requests turned away because every stream slot was taken",
+    "kpi_dashboard_poll_seconds": "Dashboard background poll of the API",
+    "kpi_dashboard_poll_failures_total": "Failed dashboard polls of the API",
+    "kpi_dashboard_render_seconds": "Dashboard script run and gauge rendering",
+    "kpi_mirror_flush_seconds": "Dashboard SQLite mirror flushes",
+}
+
+_lock = threading.Lock()
+_counters = {}
+_timings = {}
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+def inc(name, amount=1, **labels):
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + amount
+
+def observe(name, seconds, **labels):
+    key = _key(name, labels)
+    with _lock:
+        timing = _timings.get(key)
+        if timing is None:
+            timing = _timings[key] = [0, 0.0, [0] * len(TIMING_BUCKETS)]
+        timing[0] += 1
+        timing[1] += seconds
+        for i, bound in enumerate(TIMING_BUCKETS):
+            if seconds <= bound:
+                timing[2][i] += 1
+                break
+
+# Time the enclosed block, e.g. `with timed("kpi_db_query_seconds", query="kpis"):`
+@contextmanager
+def timed(name, **labels):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start, **labels)
+
+# Decorator form of timed()
+def timer(name, **labels):
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with timed(name, **labels):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+# Counters and timings as plain data: {name: [(labels, value)]} with value a
+# number for counters and {"count", "sum", "avg"} for timings (debug overlay)
+def snapshot():
+    with _lock:
+        counters = dict(_counters)
+        timings = {key: (timing[0], timing[1]) for key, timing in _timings.items()}
+    result = {}
+    for (name, labels), value in sorted(counters.items()):
+        result.setdefault(name, []).append((dict(labels), value))
+    for (name, labels), (count, total) in sorted(timings.items()):
+        result.setdefault(name, []).append((dict(labels), {"count": count, "sum": total, "avg": total / count}))
+    return result
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{key}="{value}"' for (key, _), value in zip(pairs, escaped)) + "}"
+
+# Everything in the Prometheus text exposition format (version 0.0.4)
+def render_prometheus():
+    with _lock:
+        counters = sorted(_counters.items())
+        timings = sorted((key, (timing[0], timing[1], list(timing[2]))) for key, timing in _timings.items())
+    lines = []
+    described = set()
+
+    def describe(name, kind):
+        if name not in described:
+            described.add(name)
+            if name in METRIC_HELP:
+                lines.append(f"# HELP {name} {METRIC_HELP[name]}")
+            lines.append(f"# TYPE {name} {kind}")
+
+    for (name, labels), value in counters:
+        describe(name, "counter")
+        lines.append(f"{name}{_format_labels(labels)} {value}")
+    for (name, labels), (count, total, buckets) in timings:
+        describe(name, "histogram")
+        cumulative = 0
+        for bound, bucket in zip(TIMING_BUCKETS, buckets):
+            cumulative += bucket
+            lines.append(f"{name}_bucket{_format_labels(labels, [('le', bound)])} {cumulative}")
+        lines.append(f"{name}_bucket{_format_labels(labels, [('le', '+Inf')])} {count}")
+        lines.append(f"{name}_sum{_format_labels(labels)} {total}")
+        lines.append(f"{name}_count{_format_labels(labels)} {count}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,84 @@
+import atexit
+import os
+import sqlite3
+import threading
+from kpi_metrics import timed
+from kpi_store import get_connection, upsert_kpis
+
+# Write-behind buffer for the dashboard's local SQLite mirror. Snapshots are
+# queued in memory (latest values per KPI win, rows identical to what was last
+# written are dropped) and a background thread flushes them in one transaction
+# every MIRROR_FLUSH_SECONDS, early once MIRROR_MAX_PENDING rows are waiting,
+# and once more at interpreter exit. Callers never wait on disk I/O.
+# The mirror is its own database file: the API's databases (kpi_store.DB_PATH
+# and the region files) are only ever written through the API.
+MIRROR_DB_PATH = os.getenv("MIRROR_DB_PATH", "kpi_mirror.db")
+MIRROR_FLUSH_SECONDS = float(os.getenv("MIRROR_FLUSH_SECONDS", "30"))
+MIRROR_MAX_PENDING = int(os.getenv("MIRROR_MAX_PENDING", "500"))
+
+_pending = {}
+_written = {}
+_lock = threading.Lock()
+_flush_lock = threading.Lock()
+_wake = threading.Event()
+_writer = None
+
+# Queue (kpi_name, rate, target, poids, obj, real, score) rows for the mirror.
+# Returns the number of rows now waiting to be written.
+def queue_kpis(rows):
+    with _lock:
+        for row in rows:
+            row = tuple(row)
+            if _written.get(row[0]) == row:
+                _pending.pop(row[0], None)
+            else:
+                _pending[row[0]] = row
+        pending = len(_pending)
+    _start_writer()
+    if pending >= MIRROR_MAX_PENDING:
+        _wake.set()
+    return pending
+
+# Write all queued rows to `db_path` (default MIRROR_DB_PATH) in a single
+# transaction. Returns the number of rows SQLite actually changed; on failure
+# the rows stay queued for the next flush.
+def flush(db_path=None):
+    with _flush_lock:
+        with _lock:
+            rows = dict(_pending)
+            _pending.clear()
+        if not rows:
+            return 0
+        try:
+            with timed("kpi_mirror_flush_seconds"):
+                changed = upsert_kpis(get_connection(db_path or MIRROR_DB_PATH), list(rows.values()))
+        except sqlite3.Error as e:
+            print(f"Error writing the KPI mirror: {e}")
+            with _lock:
+                for name, row in rows.items():
+                    _pending.setdefault(name, row)
+            return 0
+        with _lock:
+            _written.update(rows)
+        return changed
+
+def pending_count():
+    with _lock:
+        return len(_pending)
+
+def _run_writer():
+    while True:
+        _wake.wait(MIRROR_FLUSH_SECONDS)
+        _wake.clear()
+        flush()
+
+def _start_writer():
+    global _writer
+    if _writer is not None:
+        return
+    with _lock:
+        if _writer is None:
+            _writer = threading.Thread(target=_run_writer, name="kpi-mirror-writer", daemon=True)
+            _writer.start()
+
+atexit.register(flush)
@@ -0,0 +1,655 @@
+import os
+import re
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from itertools import islice
+from kpi_metrics import inc, timed, timer
+
+DB_PATH = os.getenv("KPI_DB_PATH", "kpi_database.db")
+
+# Each region is its own SQLite file, so ingesting one region never locks or
+# clears another. The default region keeps using DB_PATH.
+DEFAULT_REGION = "default"
+REGION_DIR = os.getenv("KPI_REGION_DIR") or os.path.join(os.path.dirname(DB_PATH), "regions")
+REGION_NAME_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+SCHEMA_VERSION = 10
+
+# Per-connection tuning: WAL lets the dashboard writer and API readers run
+# concurrently, NORMAL sync is durable across app crashes in WAL mode.
+CONNECTION_PRAGMAS = (
+    "PRAGMA busy_timeout = 5000",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA cache_size = -65536",
+    "PRAGMA temp_store = MEMORY",
+)
+DEFAULT_PERIOD = "2025"
+INSERT_CHUNK_SIZE = 5000
+# Most points query_history returns for one KPI
+HISTORY_POINT_LIMIT = 5000
+KPI_COLUMNS = ("kpi_name", "rate", "target", "poids", "obj", "real", "score")
+VALUE_COLUMNS = KPI_COLUMNS[1:]
+
+CREATE_KPIS_SQL = '''CREATE TABLE IF NOT EXISTS kpis
+                     (kpi_name TEXT NOT NULL, period TEXT NOT NULL DEFAULT '2025',
+                      rate REAL, target REAL, poids REAL, obj REAL, real REAL, score REAL, timestamp TEXT,
+                      PRIMARY KEY (kpi_name, period))'''
+
+# Every KPI write is also recorded in kpi_history, keyed by epoch seconds (last write
+# within a second wins). bulk_replace_kpis and upsert_kpis copy each batch with one
+# set-based statement (_record_history); a per-row trigger on kpis cut the bulk
+# ingest rate roughly fourfold.
+# The WITHOUT ROWID primary key doubles as a covering index for range scans.
+CREATE_HISTORY_SQL = '''CREATE TABLE IF NOT EXISTS kpi_history
+                        (kpi_name TEXT NOT NULL, ts INTEGER NOT NULL, period TEXT NOT NULL,
+                         rate REAL, target REAL, poids REAL, obj REAL, real REAL, score REAL,
+                         PRIMARY KEY (kpi_name, ts, period)) WITHOUT ROWID'''
+
+# Points already stored for the batch's second are deleted first (not INSERT OR
+# REPLACE, which would skip the rollup delete trigger)
+DELETE_BATCH_HISTORY_SQL = '''DELETE FROM kpi_history WHERE ts = ? AND (kpi_name, period) IN
+                                  (SELECT kpi_name, period FROM kpis WHERE timestamp = ?)'''
+INSERT_BATCH_HISTORY_SQL = '''INSERT INTO kpi_history (kpi_name, ts, period, rate, target, poids, obj, real, score)
+                              SELECT kpi_name, ?, period, rate, target, poids, obj, real, score
+                              FROM kpis WHERE timestamp = ?'''
+
+# Duplicate KPIs within one batch: the last row wins (as an UPDATE, so triggers see it)
+INSERT_KPI_SQL = ("INSERT INTO kpis (kpi_name, rate, target, poids, obj, real, score, period, timestamp) "
+                  "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                  "ON CONFLICT(kpi_name, period) DO UPDATE SET "
+                  + ", ".join(f"{col} = excluded.{col}" for col in VALUE_COLUMNS + ("timestamp",)))
+
+# Insert a KPI or update it in place, but only when one of its values changed
+UPSERT_KPI_SQL = ("INSERT INTO kpis (kpi_name, rate, target, poids, obj, real, score, period, timestamp) "
+                  "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                  "ON CONFLICT(kpi_name, period) DO UPDATE SET "
+                  + ", ".join(f"{col} = excluded.{col}" for col in VALUE_COLUMNS + ("timestamp",))
+                  + " WHERE " + " OR ".join(f"kpis.{col} IS NOT excluded.{col}" for col in VALUE_COLUMNS))
+
+# Weighted score sums per KPI group ("Group - KPI" name prefix), maintained
+# incrementally by triggers on kpis so reads never aggregate the raw table.
+CREATE_SCORES_SQL = '''CREATE TABLE IF NOT EXISTS kpi_scores
+                       (group_name TEXT PRIMARY KEY, score_sum REAL NOT NULL DEFAULT 0,
+                        poids_sum REAL NOT NULL DEFAULT 0, kpi_count INTEGER NOT NULL DEFAULT 0)'''
+
+GROUP_SQL = "CASE WHEN instr({row}.kpi_name, ' - ') > 0 THEN substr({row}.kpi_name, 1, instr({row}.kpi_name, ' - ') - 1) ELSE {row}.kpi_name END"
+
+ADD_SCORE_SQL = '''INSERT INTO kpi_scores (group_name, score_sum, poids_sum, kpi_count)
+                   VALUES ({group}, {sign}IFNULL({row}.score, 0), {sign}IFNULL({row}.poids, 0), {sign}1)
+                   ON CONFLICT(group_name) DO UPDATE SET score_sum = score_sum + excluded.score_sum,
+                       poids_sum = poids_sum + excluded.poids_sum, kpi_count = kpi_count + excluded.kpi_count;'''
+
+def _add_score_sql(row, sign=""):
+    return ADD_SCORE_SQL.format(group=GROUP_SQL.format(row=row), row=row, sign=sign)
+
+# The triggers are skipped while bulk_replace_kpis holds the 'bulk_replace' flag
+# in kpi_meta: it rebuilds the whole summary in one pass before committing
+SCORES_ACTIVE_SQL = "NOT EXISTS (SELECT 1 FROM kpi_meta WHERE key = 'bulk_replace')"
+
+SCORES_TRIGGERS_SQL = (
+    f"CREATE TRIGGER IF NOT EXISTS kpis_scores_insert AFTER INSERT ON kpis WHEN {SCORES_ACTIVE_SQL} "
+    f"BEGIN {_add_score_sql('NEW')} END",
+    f"CREATE TRIGGER IF NOT EXISTS kpis_scores_update AFTER UPDATE ON kpis WHEN {SCORES_ACTIVE_SQL} "
+    f"BEGIN {_add_score_sql('OLD', '-')} {_add_score_sql('NEW')} END",
+)
+SCORES_TRIGGERS = ("kpis_scores_insert", "kpis_scores_update")
+
+# Daily, weekly (ISO, starting Monday) and monthly rollups of kpi_history per
+# KPI: last, min, max and average rate and score. _record_history folds each
+# batch into its buckets with one set-based upsert per grain; the delete trigger
+# (a point replaced within the same second) takes a point back out, reading
+# history only when the point was its bucket's min, max or last value.
+# Bucket start/end expressions over epoch seconds, in UTC.
+ROLLUP_GRAINS = {
+    "day": ("({ts} / 86400) * 86400", "{start} + 86400"),
+    "week": ("({ts} / 86400 - ({ts} / 86400 + 3) % 7) * 86400", "{start} + 604800"),
+    "month": ("CAST(strftime('%s', {ts}, 'unixepoch', 'start of month') AS INTEGER)",
+              "CAST(strftime('%s', {start}, 'unixepoch', '+1 month') AS INTEGER)"),
+}
+
+CREATE_ROLLUPS_SQL = '''CREATE TABLE IF NOT EXISTS kpi_rollups
+                        (kpi_name TEXT NOT NULL, period TEXT NOT NULL, grain TEXT NOT NULL, bucket_ts INTEGER NOT NULL,
+                         last_ts INTEGER NOT NULL, last_rate REAL, last_score REAL, min_rate REAL, max_rate REAL,
+                         rate_sum REAL NOT NULL, rate_count INTEGER NOT NULL,
+                         score_sum REAL NOT NULL, score_count INTEGER NOT NULL, samples INTEGER NOT NULL,
+                         PRIMARY KEY (grain, kpi_name, period, bucket_ts)) WITHOUT ROWID'''
+
+# The batch's kpis rows (all stamped :timestamp) as one new point each at :ts
+ADD_BATCH_ROLLUP_SQL = '''INSERT INTO kpi_rollups (kpi_name, period, grain, bucket_ts, last_ts, last_rate, last_score, min_rate,
+                                                   max_rate, rate_sum, rate_count, score_sum, score_count, samples)
+                          SELECT kpi_name, period, '{grain}', {bucket}, :ts, rate, score, rate, rate,
+                                 IFNULL(rate, 0), rate IS NOT NULL, IFNULL(score, 0), score IS NOT NULL, 1
+                          FROM kpis WHERE timestamp = :timestamp
+                          ON CONFLICT(grain, kpi_name, period, bucket_ts) DO UPDATE SET
+                              last_ts = MAX(last_ts, excluded.last_ts),
+                              last_rate = CASE WHEN excluded.last_ts >= last_ts THEN excluded.last_rate ELSE last_rate END,
+                              last_score = CASE WHEN excluded.last_ts >= last_ts THEN excluded.last_score ELSE last_score END,
+                              min_rate = COALESCE(MIN(min_rate, excluded.min_rate), min_rate, excluded.min_rate),
+                              max_rate = COALESCE(MAX(max_rate, excluded.max_rate), max_rate, excluded.max_rate),
+                              rate_sum = rate_sum + excluded.rate_sum, rate_count = rate_count + excluded.rate_count,
+                              score_sum = score_sum + excluded.score_sum, score_count = score_count + excluded.score_count,
+                              samples = samples + excluded.samples'''
+
+REMOVE_ROLLUP_SQL = '''DELETE FROM kpi_rollups WHERE grain = '{grain}' AND {key} AND bucket_ts = {start} AND samples = 1;
+                       UPDATE kpi_rollups SET
+                           samples = samples - 1,
+                           rate_sum = rate_sum - IFNULL(OLD.rate, 0), rate_count = rate_count - (OLD.rate IS NOT NULL),
+                           score_sum = score_sum - IFNULL(OLD.score, 0), score_count = score_count - (OLD.score IS NOT NULL),
+                           min_rate = CASE WHEN OLD.rate <= min_rate THEN (SELECT MIN(rate) FROM kpi_history WHERE {points})
+                                           ELSE min_rate END,
+                           max_rate = CASE WHEN OLD.rate >= max_rate THEN (SELECT MAX(rate) FROM kpi_history WHERE {points})
+                                           ELSE max_rate END,
+                           last_ts = CASE WHEN OLD.ts >= last_ts THEN (SELECT MAX(ts) FROM kpi_history WHERE {points})
+                                          ELSE last_ts END,
+                           last_rate = CASE WHEN OLD.ts >= last_ts
+                                            THEN (SELECT rate FROM kpi_history WHERE {points} ORDER BY ts DESC LIMIT 1)
+                                            ELSE last_rate END,
+                           last_score = CASE WHEN OLD.ts >= last_ts
+                                             THEN (SELECT score FROM kpi_history WHERE {points} ORDER BY ts DESC LIMIT 1)
+                                             ELSE last_score END
+                       WHERE grain = '{grain}' AND {key} AND bucket_ts = {start};'''
+
+# Aggregate all of kpi_history into buckets of one grain, then fill in each
+# bucket's last values
+REBUILD_ROLLUP_SQL = (
+    '''INSERT INTO kpi_rollups (kpi_name, period, grain, bucket_ts, last_ts, last_rate, last_score, min_rate, max_rate,
+                                rate_sum, rate_count, score_sum, score_count, samples)
+       SELECT kpi_name, period, '{grain}', {bucket}, MAX(ts), NULL, NULL, MIN(rate), MAX(rate),
+              IFNULL(SUM(rate), 0), COUNT(rate), IFNULL(SUM(score), 0), COUNT(score), COUNT(*)
+       FROM kpi_history GROUP BY kpi_name, period, {bucket}''',
+    '''UPDATE kpi_rollups SET
+           last_rate = (SELECT rate FROM kpi_history h WHERE h.kpi_name = kpi_rollups.kpi_name
+                        AND h.period = kpi_rollups.period AND h.ts = kpi_rollups.last_ts),
+           last_score = (SELECT score FROM kpi_history h WHERE h.kpi_name = kpi_rollups.kpi_name
+                         AND h.period = kpi_rollups.period AND h.ts = kpi_rollups.last_ts)
+       WHERE grain = '{grain}' ''',
+)
+
+def _rollup_bucket(grain, ts):
+    return ROLLUP_GRAINS[grain][0].format(ts=ts)
+
+def _remove_rollup_sql(grain):
+    start = _rollup_bucket(grain, "OLD.ts")
+    end = ROLLUP_GRAINS[grain][1].format(start=start)
+    key = "kpi_name = OLD.kpi_name AND period = OLD.period"
+    return REMOVE_ROLLUP_SQL.format(grain=grain, key=key, start=start, points=f"{key} AND ts >= {start} AND ts < {end}")
+
+ADD_BATCH_ROLLUPS_SQL = tuple(ADD_BATCH_ROLLUP_SQL.format(grain=grain, bucket=_rollup_bucket(grain, ":ts"))
+                              for grain in ROLLUP_GRAINS)
+
+ROLLUP_TRIGGERS_SQL = (
+    "CREATE TRIGGER IF NOT EXISTS kpi_history_rollups_delete AFTER DELETE ON kpi_history BEGIN "
+    + " ".join(_remove_rollup_sql(grain) for grain in ROLLUP_GRAINS)
+    + " END",
+)
+
+# Timestamps are stored as UTC ISO 8601 strings so they sort chronologically
+TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
+LEGACY_TIMESTAMP_FORMATS = ("%Y-%m-%d %H:%M:%S", "%a %b %d %H:%M:%S %Y")
+
+# One batch timestamp as (ISO string, epoch seconds), both taken from the same instant
+def _timestamp():
+    now = datetime.now(timezone.utc)
+    return now.strftime(TIMESTAMP_FORMAT), int(now.timestamp())
+
+# Convert the local-time strftime/ctime timestamps written by older versions to UTC ISO
+def _normalize_timestamp(value):
+    for fmt in LEGACY_TIMESTAMP_FORMATS:
+        try:
+            return datetime.strptime(value, fmt).astimezone(timezone.utc).strftime(TIMESTAMP_FORMAT)
+        except (TypeError, ValueError):
+            continue
+    return value
+
+# Parse an epoch number or ISO 8601 string (naive values are UTC) into epoch seconds
+def to_epoch(value):
+    if value is None or value == "":
+        return None
+    try:
+        epoch = int(float(value))
+    except OverflowError:
+        raise ValueError(f"Timestamp out of range: {value!r}")
+    except ValueError:
+        pass
+    else:
+        # SQLite integers are 64-bit
+        if not -2 ** 63 <= epoch < 2 ** 63:
+            raise ValueError(f"Timestamp out of range: {value!r}")
+        return epoch
+    # fromisoformat only accepts a trailing "Z" from Python 3.11 on
+    if value.endswith(("Z", "z")):
+        value = value[:-1] + "+00:00"
+    dt = datetime.fromisoformat(value)
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return int(dt.timestamp())
+
+def epoch_to_iso(ts):
+    return datetime.fromtimestamp(ts, timezone.utc).strftime(TIMESTAMP_FORMAT)
+
+def _with_period(row, period, timestamp):
+    row_period = row[7] if len(row) > 7 and row[7] else period
+    return tuple(row[:7]) + (row_period, timestamp)
+
+# The rows of a pre-key kpis table (renamed kpis_legacy) with the keyed table's
+# columns, in insertion order; older tables may lack score and period
+def _legacy_rows_sql(columns):
+    score = "score" if "score" in columns else "NULL"
+    period = "period" if "period" in columns else f"'{DEFAULT_PERIOD}'"
+    return f'''SELECT kpi_name, {period} AS period, rate, target, poids, obj, real, {score} AS score, timestamp
+               FROM kpis_legacy WHERE kpi_name IS NOT NULL ORDER BY rowid'''
+
+# Rebuild a pre-key kpis table (no primary key, one copy per refresh) into the keyed schema.
+# Rows are replayed in insertion order so the most recent copy of each KPI wins.
+# The old table is kept as kpis_legacy until init_db has seeded the history from it.
+def _migrate_unkeyed_table(c, columns):
+    c.execute("ALTER TABLE kpis RENAME TO kpis_legacy")
+    c.execute(CREATE_KPIS_SQL)
+    c.execute(f'''INSERT OR REPLACE INTO kpis (kpi_name, period, rate, target, poids, obj, real, score, timestamp)
+                  SELECT kpi_name, period, rate, target, poids, obj, real, score, timestamp
+                  FROM ({_legacy_rows_sql(columns)})''')
+
+# Store ISO timestamps, add the history table and the batch timestamp index. The history
+# is seeded from `source_sql`: every copy of a pre-key table, else the current rows.
+def _migrate_history(conn, c, source_sql="SELECT * FROM kpis"):
+    conn.create_function("normalize_timestamp", 1, _normalize_timestamp)
+    c.execute("UPDATE kpis SET timestamp = normalize_timestamp(timestamp) WHERE timestamp NOT LIKE '____-__-__T%'")
+    c.execute("CREATE INDEX IF NOT EXISTS kpis_timestamp ON kpis (timestamp)")
+    c.execute(CREATE_HISTORY_SQL)
+    # Later copies of a KPI within the same second replace earlier ones
+    c.execute(f'''INSERT OR REPLACE INTO kpi_history (kpi_name, ts, period, rate, target, poids, obj, real, score)
+                  SELECT kpi_name, ts, period, rate, target, poids, obj, real, score
+                  FROM (SELECT *, CAST(strftime('%s', normalize_timestamp(timestamp)) AS INTEGER) AS ts
+                        FROM ({source_sql}))
+                  WHERE ts IS NOT NULL''')
+
+def _open(db_path):
+    conn = sqlite3.connect(db_path)
+    for pragma in CONNECTION_PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+# Generation counter bumped by every committed KPI write, shared by all processes
+def _migrate_meta(c):
+    c.execute("CREATE TABLE IF NOT EXISTS kpi_meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+    c.execute("INSERT OR IGNORE INTO kpi_meta (key, value) VALUES ('generation', 0)")
+
+def _bump_generation(c):
+    c.execute("UPDATE kpi_meta SET value = value + 1 WHERE key = 'generation'")
+
+# Current data generation; changes whenever bulk_replace_kpis or upsert_kpis wrote rows
+def data_generation(conn):
+    row = conn.execute("SELECT value FROM kpi_meta WHERE key = 'generation'").fetchone()
+    return row[0] if row else 0
+
+# Content hash of the last file ingested per source, to skip reloading unchanged files
+def _migrate_sources(c):
+    c.execute('''CREATE TABLE IF NOT EXISTS kpi_sources
+                 (source TEXT PRIMARY KEY, sha256 TEXT NOT NULL, loaded_at TEXT NOT NULL)''')
+
+def source_hash(conn, source):
+    row = conn.execute("SELECT sha256 FROM kpi_sources WHERE source = ?", (source,)).fetchone()
+    return row[0] if row else None
+
+# Materialized group scores, seeded from the rows already stored
+def _migrate_scores(c):
+    c.execute(CREATE_SCORES_SQL)
+    for trigger_sql in SCORES_TRIGGERS_SQL:
+        c.execute(trigger_sql)
+    _rebuild_scores(c)
+
+def _rebuild_scores(c):
+    c.execute("DELETE FROM kpi_scores")
+    c.execute(f'''INSERT INTO kpi_scores (group_name, score_sum, poids_sum, kpi_count)
+                  SELECT {GROUP_SQL.format(row="kpis")}, SUM(IFNULL(score, 0)), SUM(IFNULL(poids, 0)), COUNT(*)
+                  FROM kpis GROUP BY 1''')
+
+# Rollup table and triggers, seeded from the history already stored
+def _migrate_rollups(c):
+    c.execute(CREATE_ROLLUPS_SQL)
+    for trigger_sql in ROLLUP_TRIGGERS_SQL:
+        c.execute(trigger_sql)
+    _rebuild_rollups(c)
+
+def _rebuild_rollups(c):
+    c.execute("DELETE FROM kpi_rollups")
+    for grain in ROLLUP_GRAINS:
+        for sql in REBUILD_ROLLUP_SQL:
+            c.execute(sql.format(grain=grain, bucket=_rollup_bucket(grain, "ts")))
+
+# History used to be written by per-row triggers on kpis
+def _migrate_history_triggers(c):
+    c.execute("DROP TRIGGER IF EXISTS kpis_history_INSERT")
+    c.execute("DROP TRIGGER IF EXISTS kpis_history_UPDATE")
+
+# The score triggers gained their bulk_replace guard
+def _migrate_scores_triggers(c):
+    for trigger in SCORES_TRIGGERS:
+        c.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+    for trigger_sql in SCORES_TRIGGERS_SQL:
+        c.execute(trigger_sql)
+
+# Rollups used to be updated by a per-row insert trigger on kpi_history
+def _migrate_rollup_triggers(c):
+    c.execute("DROP TRIGGER IF EXISTS kpi_history_rollups_insert")
+
+# History is read from kpi_history; this index on kpis was never queried
+def _migrate_name_timestamp_index(c):
+    c.execute("DROP INDEX IF EXISTS kpis_name_timestamp")
+
+# Copy the kpis rows written in this transaction (all stamped `timestamp`) to
+# kpi_history and fold them into the rollups
+def _record_history(c, timestamp, ts):
+    c.execute(DELETE_BATCH_HISTORY_SQL, (ts, timestamp))
+    c.execute(INSERT_BATCH_HISTORY_SQL, (ts, timestamp))
+    for sql in ADD_BATCH_ROLLUPS_SQL:
+        c.execute(sql, {"ts": ts, "timestamp": timestamp})
+
+# Database setup; migrations only run when PRAGMA user_version is behind SCHEMA_VERSION.
+# DDL is transactional in SQLite, so a migration runs in one write transaction:
+# it commits as a whole or leaves the old schema untouched. The version is read
+# again once the lock is held, in case another process migrated meanwhile.
+@timer("kpi_db_init_seconds")
+def init_db(db_path=None):
+    conn = _open(db_path or DB_PATH)
+    c = conn.cursor()
+    c.execute("PRAGMA journal_mode = WAL")
+    if c.execute("PRAGMA user_version").fetchone()[0] >= SCHEMA_VERSION:
+        return conn
+    try:
+        c.execute("BEGIN IMMEDIATE")
+        version = c.execute("PRAGMA user_version").fetchone()[0]
+        if version < SCHEMA_VERSION:
+            _migrate(conn, c, version)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        conn.close()
+        raise
+    return conn
+
+def _migrate(conn, c, version):
+    c.execute(CREATE_KPIS_SQL)
+    # Migrate databases created before kpis had a (kpi_name, period) key
+    c.execute("PRAGMA table_info(kpis)")
+    table_info = c.fetchall()
+    columns = [info[1] for info in table_info]
+    key_columns = [info[1] for info in table_info if info[5]]
+    unkeyed = key_columns != ["kpi_name", "period"]
+    if unkeyed:
+        _migrate_unkeyed_table(c, columns)
+    if version < 2:
+        _migrate_history(conn, c, _legacy_rows_sql(columns) if unkeyed else "SELECT * FROM kpis")
+    if unkeyed:
+        c.execute("DROP TABLE kpis_legacy")
+    if version < 3:
+        _migrate_meta(c)
+    if version < 4:
+        _migrate_scores(c)
+    if version < 5:
+        _migrate_sources(c)
+    if version < 6:
+        _migrate_rollups(c)
+    if version < 7:
+        _migrate_history_triggers(c)
+    if version < 8:
+        _migrate_rollup_triggers(c)
+    if version < 9:
+        _migrate_name_timestamp_index(c)
+    if version < 10:
+        _migrate_scores_triggers(c)
+    c.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+class InvalidRegionError(ValueError):
+    pass
+
+# A well-formed region name with no database yet (nothing was ever written to it)
+class UnknownRegionError(LookupError):
+    pass
+
+# Database file of a region. Reads never create a region: unless `create` is
+# set (writes), a region without a database file raises UnknownRegionError.
+def region_db_path(region, create=False):
+    if region == DEFAULT_REGION:
+        return DB_PATH
+    if not REGION_NAME_PATTERN.match(region or ""):
+        raise InvalidRegionError(f"Invalid region name: {region!r}")
+    path = os.path.join(REGION_DIR, f"{region}.db")
+    if create:
+        os.makedirs(REGION_DIR, exist_ok=True)
+    elif not os.path.exists(path):
+        raise UnknownRegionError(f"Unknown region: {region!r}")
+    return path
+
+def list_regions():
+    regions = [DEFAULT_REGION]
+    if os.path.isdir(REGION_DIR):
+        regions += sorted(name[:-3] for name in os.listdir(REGION_DIR)
+                          if name.endswith(".db") and REGION_NAME_PATTERN.match(name[:-3]))
+    return regions
+
+_local = threading.local()
+_initialized = set()
+_init_lock = threading.Lock()
+
+# This thread's connection to a region's database; `create` for writes
+def region_connection(region=DEFAULT_REGION, create=False):
+    return get_connection(region_db_path(region, create))
+
+# Return this thread's long-lived connection to `db_path`, opening it on first use.
+# Schema setup and migrations run once per process and database file.
+# Connections inherited through fork() (pre-forking WSGI servers) are never
+# reused: SQLite handles must not cross process boundaries.
+def get_connection(db_path=None):
+    db_path = db_path or DB_PATH
+    connections = getattr(_local, "connections", None)
+    if connections is None or _local.pid != os.getpid():
+        connections = _local.connections = {}
+        _local.pid = os.getpid()
+    conn = connections.get(db_path)
+    if conn is None:
+        with _init_lock:
+            if db_path not in _initialized:
+                init_db(db_path).close()
+                _initialized.add(db_path)
+        conn = connections[db_path] = _open(db_path)
+    return conn
+
+# Close this thread's connections (e.g. before a worker thread exits)
+def close_connections():
+    if getattr(_local, "pid", None) == os.getpid():
+        for conn in _local.connections.values():
+            conn.close()
+    _local.connections = {}
+    _local.pid = os.getpid()
+
+# Start a write transaction, recording how long we waited for other writers
+def _begin_immediate(c):
+    with timed("kpi_db_lock_wait_seconds"):
+        c.execute("BEGIN IMMEDIATE")
+
+# Replace the whole kpis table with `rows` in a single transaction.
+# Rows are (kpi_name, rate, target, poids, obj, real, score[, period]) tuples and are
+# inserted in chunks with executemany; every row shares one batch timestamp.
+# Other connections keep seeing the previous table until the commit.
+# `source` is an optional (name, sha256) pair recorded in the same transaction.
+@timer("kpi_db_write_seconds", operation="replace")
+def bulk_replace_kpis(conn, rows, period=DEFAULT_PERIOD, chunk_size=INSERT_CHUNK_SIZE, source=None):
+    timestamp, ts = _timestamp()
+    c = conn.cursor()
+    count = 0
+    try:
+        _begin_immediate(c)
+        # The summary is rebuilt in one pass after the load; the flag, visible to
+        # this transaction only, keeps the per-row score triggers out of it
+        c.execute("INSERT INTO kpi_meta (key, value) VALUES ('bulk_replace', 1)")
+        c.execute("DELETE FROM kpis")
+        rows = iter(rows)
+        while True:
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                break
+            c.executemany(INSERT_KPI_SQL, [_with_period(row, period, timestamp) for row in chunk])
+            count += len(chunk)
+        _record_history(c, timestamp, ts)
+        _rebuild_scores(c)
+        c.execute("DELETE FROM kpi_meta WHERE key = 'bulk_replace'")
+        if source:
+            c.execute("INSERT OR REPLACE INTO kpi_sources (source, sha256, loaded_at) VALUES (?, ?, ?)",
+                      tuple(source) + (timestamp,))
+        _bump_generation(c)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    inc("kpi_rows_ingested_total", count, operation="replace")
+    return count
+
+# Insert new KPIs and update existing ones whose values changed; unchanged rows are not written.
+# Rows are (kpi_name, rate, target, poids, obj, real, score[, period]) tuples.
+# Returns the number of rows actually inserted or updated.
+@timer("kpi_db_write_seconds", operation="upsert")
+def upsert_kpis(conn, rows, period=DEFAULT_PERIOD, chunk_size=INSERT_CHUNK_SIZE):
+    timestamp, ts = _timestamp()
+    c = conn.cursor()
+    changed = 0
+    try:
+        _begin_immediate(c)
+        rows = iter(rows)
+        while True:
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                break
+            c.executemany(UPSERT_KPI_SQL, [_with_period(row, period, timestamp) for row in chunk])
+            changed += c.rowcount
+        if changed:
+            _record_history(c, timestamp, ts)
+            _bump_generation(c)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    inc("kpi_rows_ingested_total", changed, operation="upsert")
+    return changed
+
+# Time-range query over one KPI's history, oldest point first. With a bucket the
+# series is downsampled to one point per bucket: "day" (or 86400 seconds), "week"
+# and "month" are read from kpi_rollups (whole buckets overlapping the range),
+# other numbers of seconds are aggregated from kpi_history. Without a bucket the
+# raw points are returned. Either way only the latest `limit` points are kept, so
+# a seconds bucket never aggregates further back than the latest `limit` buckets
+# before `end` (or now).
+@timer("kpi_db_query_seconds", query="history")
+def query_history(conn, kpi_name, start=None, end=None, bucket=None, period=DEFAULT_PERIOD, limit=HISTORY_POINT_LIMIT):
+    if bucket == 86400:
+        bucket = "day"
+    if bucket in ROLLUP_GRAINS:
+        return _query_rollup_history(conn, kpi_name, start, end, bucket, period, limit)
+    if bucket:
+        bucket = int(bucket)
+        last = (end if end is not None else _timestamp()[1] + 1) - 1
+        earliest = (last // bucket - int(limit) + 1) * bucket
+        start = earliest if start is None else max(start, earliest)
+    where = "kpi_name = ? AND period = ?"
+    params = [kpi_name, period]
+    if start is not None:
+        where += " AND ts >= ?"
+        params.append(start)
+    if end is not None:
+        where += " AND ts < ?"
+        params.append(end)
+    if bucket:
+        sql = f'''SELECT (ts / {bucket}) * {bucket} AS bucket_ts, AVG(rate), MIN(rate), MAX(rate), AVG(score), COUNT(*)
+                  FROM kpi_history WHERE {where} GROUP BY bucket_ts ORDER BY bucket_ts DESC LIMIT ?'''
+    else:
+        sql = f"SELECT ts, rate, rate, rate, score, 1 FROM kpi_history WHERE {where} ORDER BY ts DESC LIMIT ?"
+    params.append(int(limit))
+    return _history_points(conn.execute(sql, params).fetchall())
+
+def _query_rollup_history(conn, kpi_name, start, end, grain, period, limit):
+    where = "grain = :grain AND kpi_name = :kpi_name AND period = :period"
+    params = {"grain": grain, "kpi_name": kpi_name, "period": period, "limit": int(limit)}
+    if start is not None:
+        where += f" AND bucket_ts >= {_rollup_bucket(grain, ':start')}"
+        params["start"] = start
+    if end is not None:
+        where += " AND bucket_ts < :end"
+        params["end"] = end
+    sql = f'''SELECT bucket_ts, CASE WHEN rate_count THEN rate_sum / rate_count END, min_rate, max_rate,
+                     CASE WHEN score_count THEN score_sum / score_count END, samples
+              FROM kpi_rollups WHERE {where} ORDER BY bucket_ts DESC LIMIT :limit'''
+    return _history_points(conn.execute(sql, params).fetchall())
+
+# (bucket_ts, rate, rate_min, rate_max, score, count) rows, newest first -> points, oldest first
+def _history_points(rows):
+    return [{
+        "timestamp": epoch_to_iso(row[0]),
+        "rate": row[1],
+        "rate_min": row[2],
+        "rate_max": row[3],
+        "score": row[4],
+        "count": row[5]
+    } for row in reversed(rows)]
+
+# Precomputed rollups of one grain ("day", "week" or "month"), oldest bucket
+# first: {kpi_name: [points]}. `limit` keeps each KPI's latest buckets only.
+@timer("kpi_db_query_seconds", query="rollups")
+def query_rollups(conn, grain, kpi_name=None, start=None, end=None, limit=None, period=DEFAULT_PERIOD):
+    if grain not in ROLLUP_GRAINS:
+        raise ValueError(f"Unknown rollup grain: {grain!r}")
+    where = "grain = ? AND period = ?"
+    params = [grain, period]
+    if kpi_name is not None:
+        where += " AND kpi_name = ?"
+        params.append(kpi_name)
+    if start is not None:
+        where += " AND bucket_ts >= ?"
+        params.append(start)
+    if end is not None:
+        where += " AND bucket_ts < ?"
+        params.append(end)
+    columns = "kpi_name, bucket_ts, last_rate, last_score, min_rate, max_rate, rate_sum, rate_count, score_sum, score_count, samples"
+    if limit:
+        sql = f'''SELECT {columns} FROM (
+                     SELECT {columns}, ROW_NUMBER() OVER (PARTITION BY kpi_name ORDER BY bucket_ts DESC) AS recent
+                     FROM kpi_rollups WHERE {where})
+                  WHERE recent <= ? ORDER BY kpi_name, bucket_ts'''
+        params.append(int(limit))
+    else:
+        sql = f"SELECT {columns} FROM kpi_rollups WHERE {where} ORDER BY kpi_name, bucket_ts"
+    rollups = {}
+    for row in conn.execute(sql, params):
+        rollups.setdefault(row[0], []).append({
+            "timestamp": epoch_to_iso(row[1]),
+            "rate": row[2],
+            "score": row[3],
+            "rate_min": row[4],
+            "rate_max": row[5],
+            "rate_avg": row[6] / row[7] if row[7] else None,
+            "score_avg": row[8] / row[9] if row[9] else None,
+            "count": row[10]
+        })
+    return rollups
+
+# Weighted score (sum of scores / sum of weights, in percent); None without weights
+def weighted_score(score_sum, poids_sum):
+    return score_sum / poids_sum * 100 if poids_sum else None
+
+# Group scores and the overall (regional) score from the materialized summary
+def query_scores(conn):
+    groups = [{
+        "group": row[0],
+        "score": weighted_score(row[1], row[2]),
+        "score_sum": row[1],
+        "poids_sum": row[2],
+        "kpi_count": row[3]
+    } for row in conn.execute("SELECT group_name, score_sum, poids_sum, kpi_count FROM kpi_scores WHERE kpi_count > 0 ORDER BY group_name")]
+    score_sum = sum(group["score_sum"] for group in groups)
+    poids_sum = sum(group["poids_sum"] for group in groups)
+    return {
+        "score": weighted_score(score_sum, poids_sum),
+        "score_sum": score_sum,
+        "poids_sum": poids_sum,
+        "kpi_count": sum(group["kpi_count"] for group in groups),
+        "groups": groups
+    }
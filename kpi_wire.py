@@ -0,0 +1,84 @@
+import json
+import struct
+import sys
+from array import array
+
+# Compact columnar KPI snapshot, negotiated with `Accept: application/vnd.kpi.columnar`.
+# Layout: a little-endian uint32 header length, a JSON header
+# {"count": n, "columns": [...], "kpi_name": [...]} padded with spaces so the
+# values start 8-byte aligned, then the numeric columns one after the other as
+# little-endian float64 arrays (missing values are NaN). The encoder needs only
+# the standard library; the decoder maps the values into NumPy without copying.
+COLUMNAR_MIMETYPE = "application/vnd.kpi.columnar"
+VALUE_COLUMNS = ("rate", "target", "poids", "obj", "real", "score")
+HEADER_SIZE = struct.Struct("<I")
+
+# Values that are not numbers (e.g. stored by an older API version) become NaN
+def _float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return float("nan")
+
+# Encode API KPI records (dicts with kpi_name and VALUE_COLUMNS) as one columnar body
+def encode_columnar(records):
+    header = json.dumps({
+        "count": len(records),
+        "columns": list(VALUE_COLUMNS),
+        "kpi_name": [record["kpi_name"] for record in records],
+    }, ensure_ascii=False).encode("utf-8")
+    header += b" " * (-(HEADER_SIZE.size + len(header)) % 8)
+    values = array("d", (_float(record[column]) for column in VALUE_COLUMNS for record in records))
+    if sys.byteorder != "little":
+        values.byteswap()
+    return HEADER_SIZE.pack(len(header)) + header + values.tobytes()
+
+# Decode a columnar body into (kpi names, {column: float64 array}); the arrays
+# are read-only views over `body`
+def decode_columnar(body):
+    import numpy as np
+
+    (size,) = HEADER_SIZE.unpack_from(body)
+    header = json.loads(body[HEADER_SIZE.size:HEADER_SIZE.size + size])
+    count, columns = header["count"], header["columns"]
+    values = np.frombuffer(body, dtype="<f8", count=count * len(columns), offset=HEADER_SIZE.size + size)
+    return header["kpi_name"], dict(zip(columns, values.reshape(len(columns), count)))
+
+# Decode a columnar body into the dashboard's (kpi_name, rate, target, poids,
+# obj, real, score) tuples, with NaN turned back into None
+def decode_kpi_rows(body):
+    import numpy as np
+
+    names, columns = decode_columnar(body)
+    values = []
+    for column in VALUE_COLUMNS:
+        data = columns[column]
+        missing = np.isnan(data)
+        if missing.any():
+            values.append([None if gap else value for gap, value in zip(missing.tolist(), data.tolist())])
+        else:
+            values.append(data.tolist())
+    return list(zip(names, *values))
+
+# API KPI record -> the dashboard's (kpi_name, rate, target, poids, obj, real, score) tuple
+def record_to_kpi(item):
+    return (item["kpi_name"], item["rate"], item["target"], item["poids"], item["obj"], item["real"], item.get("score"))
+
+# The dashboard's KPI tuples after one /api/kpis/stream event: a "snapshot"
+# replaces them, a "delta" (see api.kpi_delta) is merged into `kpi_data`.
+# Returns None for unknown events.
+def apply_kpi_event(kpi_data, event, payload):
+    if event == "snapshot":
+        records = {item["kpi_name"]: record_to_kpi(item) for item in payload["kpis"]}
+        order = list(records)
+    elif event == "delta":
+        records = {kpi[0]: kpi for kpi in kpi_data or []}
+        for name in payload.get("removed", []):
+            records.pop(name, None)
+        for item in payload.get("changed", []):
+            records[item["kpi_name"]] = record_to_kpi(item)
+        order = payload.get("order") or [name for name in (kpi[0] for kpi in kpi_data or []) if name in records]
+        order += [name for name in records if name not in order]
+    else:
+        return None
+    return [records[name] for name in order if name in records]
@@ -0,0 +1,99 @@
+import argparse
+import os
+from api import app, startup, set_stream_limit
+from kpi_store import close_connections
+
+API_HOST = os.getenv("API_HOST", "0.0.0.0")
+API_PORT = int(os.getenv("API_PORT", "8502"))
+
+# Production entry point: gunicorn with several worker processes. The data is
+# ingested once in the master before workers fork; each worker opens its own
+# SQLite connections, response caches follow the shared data generation and
+# streams pick up writes made by other workers within STREAM_POLL_SECONDS (one
+# generation watcher thread per worker).
+# An open /stream connection pins one worker thread until the client leaves, so
+# each worker gets `threads` threads for normal requests plus `stream_threads`
+# extra ones, and the API caps open streams per worker at `stream_threads`:
+# streams can never take the threads normal requests need. Stream capacity is up
+# to workers * stream_threads dashboards (200 with the defaults, a little less
+# when connections land unevenly on the workers); subscribers beyond that get a
+# 503 and poll instead.
+def run_gunicorn(host, port, workers, threads, stream_threads, timeout):
+    from gunicorn.app.base import BaseApplication
+
+    total_threads = threads + stream_threads
+
+    class KpiApplication(BaseApplication):
+        def load_config(self):
+            self.cfg.set("bind", f"{host}:{port}")
+            self.cfg.set("workers", workers)
+            self.cfg.set("threads", total_threads)
+            self.cfg.set("worker_class", "gthread" if total_threads > 1 else "sync")
+            self.cfg.set("timeout", timeout)
+
+        def load(self):
+            return app
+
+    KpiApplication().run()
+
+# Fallback when gunicorn is not installed (e.g. on Windows): one process with a
+# fixed pool of `threads + stream_threads` request threads. werkzeug's own
+# threaded mode starts a thread per request, which would open (and drop) a
+# thread-local SQLite connection per region on every request; pool threads keep
+# theirs. Requests beyond the pool wait in the pool's queue, and the stream cap
+# keeps streams from taking the threads normal requests need, as with gunicorn.
+def run_werkzeug(host, port, threads, stream_threads):
+    from concurrent.futures import ThreadPoolExecutor
+    from werkzeug.serving import BaseWSGIServer
+
+    class PooledWSGIServer(BaseWSGIServer):
+        multithread = True
+
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.pool = ThreadPoolExecutor(threads + stream_threads, thread_name_prefix="kpi-api")
+
+        def process_request(self, request, client_address):
+            self.pool.submit(self.process_request_thread, request, client_address)
+
+        def process_request_thread(self, request, client_address):
+            try:
+                self.finish_request(request, client_address)
+            except Exception:
+                self.handle_error(request, client_address)
+            finally:
+                self.shutdown_request(request)
+
+        def server_close(self):
+            super().server_close()
+            self.pool.shutdown(wait=False, cancel_futures=True)
+
+    server = PooledWSGIServer(host, port, app)
+    print(f" * Serving the KPI API on http://{host}:{port}")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Serve the KPI API in production mode")
+    parser.add_argument("--host", default=API_HOST)
+    parser.add_argument("--port", type=int, default=API_PORT)
+    parser.add_argument("--workers", type=int, default=int(os.getenv("API_WORKERS", "2")), help="worker processes")
+    parser.add_argument("--threads", type=int, default=int(os.getenv("API_THREADS", "8")), help="threads per worker")
+    parser.add_argument("--stream-threads", type=int, default=int(os.getenv("API_STREAM_THREADS", "100")),
+                        help="extra threads per worker reserved for /stream connections (0 disables streaming)")
+    parser.add_argument("--timeout", type=int, default=120, help="worker timeout in seconds")
+    parser.add_argument("--skip-ingest", action="store_true", help="start without loading kpi_data.json")
+    args = parser.parse_args()
+    if not args.skip_ingest:
+        startup()
+    # Never hand the master's SQLite connections to forked workers
+    close_connections()
+    # Set before forking so every worker inherits the cap
+    set_stream_limit(args.stream_threads)
+    try:
+        run_gunicorn(args.host, args.port, args.workers, args.threads, args.stream_threads, args.timeout)
+    except ImportError:
+        print("gunicorn is not installed, falling back to a single-process werkzeug server")
+        run_werkzeug(args.host, args.port, args.threads, args.stream_threads)
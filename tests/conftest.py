@@ -0,0 +1,16 @@
+import os
+import sys
+
+import pytest
+
+# The modules live at the top level of the repository
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import kpi_store  # noqa: E402
+
+# Fresh database for one test
+@pytest.fixture
+def db(tmp_path):
+    conn = kpi_store.init_db(str(tmp_path / "test.db"))
+    yield conn
+    conn.close()
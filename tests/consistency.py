@@ -0,0 +1,27 @@
+# Shared by the trigger consistency tests: random workload values and the
+# comparison of a trigger-maintained table with a full rebuild of it
+TOLERANCE = 1e-6
+
+def random_value(rng, scale):
+    return None if rng.random() < 0.15 else rng.uniform(0, scale)
+
+# Rows `read(conn)` returns after `rebuild(cursor)`, without keeping the rebuild
+def rebuilt_rows(conn, rebuild, read):
+    c = conn.cursor()
+    c.execute("SAVEPOINT rebuild")
+    try:
+        rebuild(c)
+        return read(conn)
+    finally:
+        c.execute("ROLLBACK TO rebuild")
+        c.execute("RELEASE rebuild")
+
+def same_row(a, b):
+    return len(a) == len(b) and all(
+        x == y or (isinstance(x, float) and isinstance(y, float) and abs(x - y) <= TOLERANCE * max(1, abs(y)))
+        for x, y in zip(a, b))
+
+def assert_same_rows(incremental, rebuilt):
+    assert len(incremental) == len(rebuilt)
+    mismatches = [(a, b) for a, b in zip(incremental, rebuilt) if not same_row(a, b)]
+    assert not mismatches, f"{len(mismatches)} rows differ from the rebuild, first: {mismatches[0]}"
@@ -0,0 +1,268 @@
+# The Flask API against a fresh default-region database, through app.test_client()
+import io
+import json
+import os
+import threading
+import zipfile
+
+import pytest
+
+import api
+import kpi_store
+from kpi_wire import apply_kpi_event, record_to_kpi
+
+KPIS = [{"kpi_name": "Commercial - Production THD", "rate": 138.3, "target": 4782.0, "poids": 0.04,
+         "obj": 4782.0, "real": 6615.0, "score": 0.055},
+        {"kpi_name": "Technique - Disponibilité", "rate": 99.1, "target": 99.5, "poids": 0.05,
+         "obj": 99.5, "real": 98.6, "score": 0.049}]
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(kpi_store, "DB_PATH", str(tmp_path / "kpi_database.db"))
+    monkeypatch.setattr(kpi_store, "REGION_DIR", str(tmp_path / "regions"))
+    monkeypatch.setattr(api, "_payload_cache", {})
+    monkeypatch.setattr(api, "_rebuild_locks", {})
+    yield api.app.test_client()
+    kpi_store.close_connections()
+
+def test_concurrent_misses_run_one_query(client, monkeypatch):
+    client.post("/api/kpis", json=KPIS)
+    queries = []
+
+    def query_kpis(conn):
+        queries.append(threading.get_ident())
+        return original(conn)
+    original = api.query_kpis
+    monkeypatch.setattr(api, "query_kpis", query_kpis)
+
+    readers = 20
+    barrier = threading.Barrier(readers)
+    snapshots = []
+
+    def read():
+        barrier.wait()
+        snapshots.append(api.cached_kpis_snapshot())
+        kpi_store.close_connections()
+    threads = [threading.Thread(target=read) for _ in range(readers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(queries) == 1
+    assert len({snapshot["etag"] for snapshot in snapshots}) == 1
+
+def test_history_needs_a_range_or_bucket_for_raw_points(client):
+    client.post("/api/kpis", json=KPIS)
+    assert client.get("/api/kpis/history?kpi=Technique - Disponibilité").status_code == 400
+    response = client.get("/api/kpis/history?kpi=Technique - Disponibilité&bucket=day")
+    assert response.status_code == 200
+    assert response.get_json()["bucket"] == "day" and len(response.get_json()["points"]) == 1
+
+@pytest.mark.parametrize("bucket", ["2025-01-01", "0", "-3600", "1.5", "fortnight"])
+def test_history_bucket_must_be_a_positive_number_of_seconds(client, bucket):
+    client.post("/api/kpis", json=KPIS)
+    response = client.get(f"/api/kpis/history?kpi=Technique - Disponibilité&bucket={bucket}")
+    assert response.status_code == 400 and "bucket must be" in response.get_json()["error"]
+
+@pytest.mark.parametrize("method", ["post", "patch"])
+def test_only_the_default_period_is_accepted(client, method):
+    send = getattr(client, method)
+    assert send("/api/kpis", json=[dict(KPIS[0], period="2026")]).status_code == 400
+    assert send("/api/kpis", json=[dict(KPIS[0], period=kpi_store.DEFAULT_PERIOD)]).status_code == 200
+    assert [kpi["kpi_name"] for kpi in client.get("/api/kpis").get_json()] == [KPIS[0]["kpi_name"]]
+
+# Server-sent events of an open stream response as (event, payload) pairs
+def sse_events(response):
+    for chunk in response.response:
+        chunk = chunk.decode() if isinstance(chunk, bytes) else chunk
+        if chunk.startswith("event:"):
+            event, data = chunk.strip().split("\n")
+            yield event[len("event: "):], json.loads(data[len("data: "):])
+
+def test_stream_sends_a_snapshot_then_deltas(client, monkeypatch):
+    monkeypatch.setattr(api, "STREAM_POLL_SECONDS", 0.05)
+    monkeypatch.setattr(api, "MAX_STREAMS", 1)
+    monkeypatch.setattr(api, "_stream_slots", threading.BoundedSemaphore(1))
+    client.post("/api/kpis", json=KPIS)
+
+    response = client.get("/api/kpis/stream", buffered=False)
+    assert response.status_code == 200 and response.mimetype == "text/event-stream"
+    events = sse_events(response)
+    try:
+        event, payload = next(events)
+        assert event == "snapshot"
+        kpi_data = apply_kpi_event(None, event, payload)
+        assert [kpi[0] for kpi in kpi_data] == [kpi["kpi_name"] for kpi in KPIS]
+
+        changed = dict(KPIS[1], rate=101.5)
+        added = dict(KPIS[0], kpi_name="Commercial - M prp Net")
+        client.patch("/api/kpis", json=[changed, added])
+        event, payload = next(events)
+        assert event == "delta"
+        assert payload["changed"] == [changed, added] and payload["removed"] == []
+        kpi_data = apply_kpi_event(kpi_data, event, payload)
+        assert kpi_data == [record_to_kpi(item) for item in client.get("/api/kpis").get_json()]
+
+        # The only stream slot is taken
+        assert client.get("/api/kpis/stream").status_code == 503
+    finally:
+        response.close()
+    assert client.get("/api/kpis/stream", buffered=False).status_code == 200
+
+@pytest.fixture
+def stream_slots(monkeypatch):
+    monkeypatch.setattr(api, "STREAM_POLL_SECONDS", 0.05)
+    monkeypatch.setattr(api, "MAX_STREAMS", 2)
+    monkeypatch.setattr(api, "_stream_slots", threading.BoundedSemaphore(2))
+
+# Writes from another process never call notify_kpi_change: the generation
+# watcher picks them up
+def test_stream_sees_writes_from_other_processes(client, stream_slots):
+    client.post("/api/kpis", json=KPIS)
+    response = client.get("/api/kpis/stream", buffered=False)
+    events = sse_events(response)
+    try:
+        assert next(events)[0] == "snapshot"
+        conn = kpi_store.init_db(kpi_store.DB_PATH)
+        kpi_store.upsert_kpis(conn, [api.record_to_row(dict(KPIS[0], rate=1.0))])
+        conn.close()
+        event, payload = next(events)
+        assert event == "delta" and payload["changed"] == [dict(KPIS[0], rate=1.0)]
+    finally:
+        response.close()
+
+# An idle stream only sends keepalives; the database is read by the watcher thread alone
+# (the test client can only interleave one streaming response per thread)
+def test_idle_streams_do_not_read_the_database(client, stream_slots, monkeypatch):
+    monkeypatch.setattr(api, "STREAM_KEEPALIVE_SECONDS", 0.3)
+    client.post("/api/kpis", json=KPIS)
+    reads = []
+
+    def data_generation(conn):
+        reads.append(threading.current_thread().name)
+        return original(conn)
+    original = api.data_generation
+    monkeypatch.setattr(api, "data_generation", data_generation)
+
+    response = client.get("/api/kpis/stream", buffered=False)
+    try:
+        chunks = iter(response.response)
+        assert next(chunks).startswith(b"event: snapshot")
+        del reads[:]
+        assert next(chunks) == b": keepalive\n\n"
+        assert next(chunks) == b": keepalive\n\n"
+        assert reads and set(reads) == {"kpi-generation-watcher"}
+    finally:
+        response.close()
+    assert api._stream_regions == {} and api._stream_generations == {}
+
+def test_streams_are_disabled_without_reserved_threads(client, monkeypatch):
+    monkeypatch.setattr(api, "MAX_STREAMS", 0)
+    monkeypatch.setattr(api, "_stream_slots", None)
+    response = client.get("/api/kpis/stream")
+    assert response.status_code == 503
+    assert "disabled" in response.get_json()["error"]
+    assert response.headers["Retry-After"] == str(api.STREAM_RETRY_AFTER_SECONDS)
+
+def test_kpi_delta_reports_removed_names_and_order():
+    a, b, c = ({"kpi_name": name, "rate": 1.0} for name in "abc")
+    delta = api.kpi_delta([a, b], [c, dict(a, rate=2.0)])
+    assert delta == {"changed": [c, dict(a, rate=2.0)], "removed": ["b"], "order": ["c", "a"]}
+    assert api.kpi_delta([a, b], [a, b]) == {"changed": [], "removed": []}
+
+def test_unchanged_kpis_are_revalidated_with_304(client):
+    client.post("/api/kpis", json=KPIS)
+    first = client.get("/api/kpis")
+    etag = first.headers["ETag"]
+    assert client.get("/api/kpis", headers={"If-None-Match": etag}).status_code == 304
+
+    client.patch("/api/kpis", json=[dict(KPIS[0], rate=140.0)])
+    changed = client.get("/api/kpis", headers={"If-None-Match": etag})
+    assert changed.status_code == 200 and changed.headers["ETag"] != etag
+
+# Client-chosen limits neither grow the payload cache nor the metric labels without bound
+def test_rollup_payloads_are_cached_for_a_few_forms(client, monkeypatch):
+    client.post("/api/kpis", json=KPIS)
+    labels = []
+    monkeypatch.setattr(api, "inc", lambda name, **labels_: labels.append(labels_.get("payload")))
+    for limit in range(1, 3 * api.MAX_CACHED_ROLLUP_PAYLOADS):
+        response = client.get(f"/api/kpis/rollups?grain=day&limit={limit}")
+        assert response.status_code == 200 and set(response.get_json()["kpis"]) == {kpi["kpi_name"] for kpi in KPIS}
+    cached = [name for _, name in api._payload_cache if name.startswith("rollups:")]
+    assert len(cached) == api.MAX_CACHED_ROLLUP_PAYLOADS
+    assert set(labels) <= {"rollups", None}
+
+    # A form cached earlier keeps being served from the cache
+    etag = client.get("/api/kpis/rollups?grain=day&limit=1").headers["ETag"]
+    assert client.get("/api/kpis/rollups?grain=day&limit=1", headers={"If-None-Match": etag}).status_code == 304
+
+def test_reads_never_create_regions(client):
+    for path in ("/api/nowhere/kpis", "/api/nowhere/scores", "/api/nowhere/kpis/stream",
+                 "/api/nowhere/kpis/history?kpi=x&bucket=day"):
+        assert client.get(path).status_code == 404
+    assert not os.path.exists(os.path.join(kpi_store.REGION_DIR, "nowhere.db"))
+    assert client.get("/api/bad.name/kpis").status_code == 400
+
+    assert client.post("/api/nowhere/kpis", json=KPIS).status_code == 200
+    assert len(client.get("/api/nowhere/kpis").get_json()) == len(KPIS)
+    assert client.get("/api/regions").get_json() == ["default", "nowhere"]
+
+@pytest.mark.parametrize("body", [
+    '[{"kpi_name": "A", "rate": NaN}]',
+    '[{"kpi_name": "A", "rate": Infinity}]',
+    '[{"kpi_name": "A", "score": -Infinity}]',
+    '[{"kpi_name": "A", "rate": "12.5"}]',
+    '[{"kpi_name": "A", "rate": true}]',
+    '[{"kpi_name": "A", "rate": 1e400}]',
+    '[{"kpi_name": "A", "target": 99999999999999999999}]',
+])
+@pytest.mark.parametrize("method", ["post", "patch"])
+def test_non_finite_and_non_numeric_values_are_rejected(client, method, body):
+    response = getattr(client, method)("/api/kpis", data=body, content_type="application/json")
+    assert response.status_code == 400
+    assert "finite number" in response.get_json()["error"]
+    assert not os.path.exists(kpi_store.DB_PATH) or client.get("/api/kpis").get_json() == []
+
+WORKBOOK = os.path.join(os.path.dirname(__file__), "..", "Application-score.xlsx")
+
+# A zip archive without the workbook parts ([Content_Types].xml etc.)
+def plain_zip():
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        archive.writestr("notes.txt", "not a workbook")
+    return buffer.getvalue()
+
+@pytest.mark.parametrize("upload, sheet, status, error", [
+    ("workbook", None, 200, None),
+    ("workbook", "Feuil2", 200, None),
+    ("workbook", "Nope", 400, "Unknown worksheet 'Nope', expected one of: Feuil2"),
+    ("zip", None, 400, "Uploaded file is not a valid .xlsx workbook"),
+    ("text", None, 400, "Uploaded file is not a valid .xlsx workbook"),
+])
+def test_import_workbook(client, upload, sheet, status, error):
+    if upload == "workbook":
+        with open(WORKBOOK, "rb") as f:
+            content = f.read()
+    else:
+        content = plain_zip() if upload == "zip" else b"Objectifs;poids\n"
+    form = {"file": (io.BytesIO(content), "Application-score.xlsx")}
+    if sheet:
+        form["sheet"] = sheet
+    response = client.post("/api/kpis/import", data=form, content_type="multipart/form-data")
+    assert response.status_code == status
+    if status == 200:
+        assert response.get_json()["records"] == len(client.get("/api/kpis").get_json()) > 0
+    else:
+        assert response.get_json()["error"] == error
+
+@pytest.mark.parametrize("content, sheet", [(plain_zip(), None), (b"not a workbook", None), (None, "Nope")])
+def test_failed_import_does_not_create_the_region(client, content, sheet):
+    if content is None:
+        with open(WORKBOOK, "rb") as f:
+            content = f.read()
+    form = {"file": (io.BytesIO(content), "Application-score.xlsx")}
+    if sheet:
+        form["sheet"] = sheet
+    assert client.post("/api/north/kpis/import", data=form, content_type="multipart/form-data").status_code == 400
+    assert not os.path.exists(os.path.join(kpi_store.REGION_DIR, "north.db"))
+    assert client.get("/api/regions").get_json() == ["default"]
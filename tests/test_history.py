@@ -0,0 +1,90 @@
+# kpi_history as written by bulk_replace_kpis and upsert_kpis, and read back
+# through query_history
+import pytest
+
+import kpi_store
+
+KPI = "Commercial - M prp Net"
+START = 1_760_000_000  # Thursday 2025-10-09
+
+def row(rate, period=None):
+    return (KPI, rate, 58185.0, 0.03, 58185.0, 32629.0, rate / 1000) + ((period,) if period else ())
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [START]
+    monkeypatch.setattr(kpi_store, "_timestamp", lambda: (kpi_store.epoch_to_iso(now[0]), now[0]))
+    return now
+
+@pytest.mark.parametrize("value, epoch", [
+    ("1760000000", START),
+    ("1760000000.9", START),
+    ("2025-10-09T08:53:20Z", START),
+    ("2025-10-09T08:53:20z", START),
+    ("2025-10-09T08:53:20", START),
+    ("2025-10-09T10:53:20+02:00", START),
+    ("", None),
+])
+def test_to_epoch(value, epoch):
+    assert kpi_store.to_epoch(value) == epoch
+
+@pytest.mark.parametrize("value", ["inf", "-inf", "nan", "1e30", "-1e19", "yesterday"])
+def test_to_epoch_rejects_non_finite_and_out_of_range_values(value):
+    with pytest.raises(ValueError):
+        kpi_store.to_epoch(value)
+
+# Without a stubbed clock: the epoch stored in kpi_history is the batch's ISO timestamp
+def test_history_epoch_matches_the_batch_timestamp(db):
+    kpi_store.upsert_kpis(db, [row(50.0)])
+    timestamp, ts = db.execute("SELECT timestamp, ts FROM kpis JOIN kpi_history USING (kpi_name, period)").fetchone()
+    assert timestamp.endswith("Z") and kpi_store.to_epoch(timestamp) == ts
+
+# History is copied once per batch; kpis has no per-row history triggers
+def test_history_is_written_per_batch(db, clock):
+    other = ("Technique - Disponibilité", 99.1, 99.5, 0.05, 99.5, 98.6, 0.049)
+    kpi_store.bulk_replace_kpis(db, [row(50.0), other])
+    clock[0] += 60
+    assert kpi_store.upsert_kpis(db, [row(55.0), other]) == 1
+    kpi_store.upsert_kpis(db, [row(60.0)])  # same second: replaces the point
+    assert db.execute("SELECT kpi_name, ts, rate FROM kpi_history ORDER BY ts, kpi_name").fetchall() == [
+        (KPI, START, 50.0), (other[0], START, 99.1), (KPI, START + 60, 60.0)]
+    triggers = [name for (name,) in db.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'kpis'")]
+    assert sorted(triggers) == sorted(kpi_store.SCORES_TRIGGERS)
+
+def test_history_is_scoped_to_one_period(db, clock):
+    kpi_store.upsert_kpis(db, [row(50.0), row(70.0, "2026")])
+    clock[0] += 60
+    kpi_store.upsert_kpis(db, [row(55.0), row(75.0, "2026")])
+    assert [point["rate"] for point in kpi_store.query_history(db, KPI)] == [50.0, 55.0]
+    assert [point["rate"] for point in kpi_store.query_history(db, KPI, period="2026")] == [70.0, 75.0]
+
+def test_history_keeps_the_latest_points(db, clock):
+    for rate in range(10):
+        clock[0] += 60
+        kpi_store.upsert_kpis(db, [row(float(rate))])
+    points = kpi_store.query_history(db, KPI, limit=3)
+    assert [point["rate"] for point in points] == [7.0, 8.0, 9.0]
+
+@pytest.mark.parametrize("grain", list(kpi_store.ROLLUP_GRAINS))
+def test_named_buckets_are_read_from_rollups(db, clock, grain):
+    for rate in (10.0, 20.0, 60.0):
+        clock[0] += 3600
+        kpi_store.upsert_kpis(db, [row(rate)])
+    [point] = kpi_store.query_history(db, KPI, START, START + 86400, grain)
+    assert (point["rate"], point["rate_min"], point["rate_max"], point["count"]) == (30.0, 10.0, 60.0, 3)
+    assert point["timestamp"] == kpi_store.query_rollups(db, grain, KPI)[KPI][0]["timestamp"]
+
+# Without a range a seconds bucket only aggregates the latest `limit` buckets before now
+def test_seconds_buckets_default_to_the_latest_buckets(db, clock):
+    for _ in range(6):
+        clock[0] += 3600
+        kpi_store.upsert_kpis(db, [row(float(clock[0] % 1000))])
+    points = kpi_store.query_history(db, KPI, bucket=3600, limit=2)
+    assert [point["timestamp"] for point in points] == [kpi_store.epoch_to_iso((START // 3600 + h) * 3600) for h in (5, 6)]
+    assert kpi_store.query_history(db, KPI, end=START + 3 * 3600 + 1, bucket=3600, limit=2)[-1]["count"] == 1
+
+def test_86400_second_buckets_are_read_from_day_rollups(db, clock):
+    for rate in (10.0, 20.0):
+        clock[0] += 3600
+        kpi_store.upsert_kpis(db, [row(rate)])
+    assert kpi_store.query_history(db, KPI, bucket=86400) == kpi_store.query_history(db, KPI, bucket="day")
@@ -0,0 +1,52 @@
+# kpi_layout: group bands, paging and the regional score slot
+import pytest
+
+from kpi_layout import KPI_SLOT, REGION_SLOT, group_bands_html, layout_pages, row_bands, split_kpi_name
+
+def kpi(group, index):
+    return {"kind": KPI_SLOT, "index": index, "group": group, "subcategory": f"KPI {index}"}
+
+def test_split_kpi_name():
+    assert split_kpi_name("Commercial - M prp Net") == ("Commercial", "M prp Net")
+    assert split_kpi_name("Autre - A - B") == ("Autre", "A - B")
+    assert split_kpi_name("Sans groupe") == ("Sans groupe", "Sans groupe")
+
+def test_row_bands_merge_consecutive_groups():
+    cells = [kpi("A", 0), kpi("A", 1), kpi("B", 2), None, None, kpi("A", 3)]
+    assert row_bands(cells) == [("A", 0, 2), ("B", 2, 1), (None, 3, 2), ("A", 5, 1)]
+
+def test_pages_reserve_the_last_cell_for_the_region():
+    names = [f"G{i // 4} - KPI {i}" for i in range(20)]
+    pages = layout_pages(names, max_cols=6, rows_per_page=3)
+    assert len(pages) == 2
+    assert [len(page) for page in pages] == [3, 1]
+    for page in pages:
+        assert page[-1]["cells"][-1] == {"kind": REGION_SLOT, "index": None, "group": None, "subcategory": None}
+    indexes = [cell["index"] for page in pages for row in page for cell in row["cells"] if cell and cell["index"] is not None]
+    assert indexes == list(range(20))
+    # 17 KPIs on the first page, 3 and the region on the second
+    assert [cell and cell["kind"] for cell in pages[1][0]["cells"]] == [KPI_SLOT] * 3 + [None, None, REGION_SLOT]
+    assert pages[1][0]["bands"] == [("G4", 0, 3), (None, 3, 3)]
+
+def test_without_region():
+    [page] = layout_pages(["A - 1", "A - 2"], max_cols=2, rows_per_page=1, with_region=False)
+    assert [[cell["kind"] for cell in row["cells"]] for row in page] == [[KPI_SLOT, KPI_SLOT]]
+    assert layout_pages([], max_cols=3, rows_per_page=2) == [[{
+        "cells": [None, None, {"kind": REGION_SLOT, "index": None, "group": None, "subcategory": None}],
+        "bands": [(None, 0, 3)]}]]
+
+# KPI names come from API clients: a "region" group is an ordinary KPI group
+@pytest.mark.parametrize("count", [1, 5, 6])
+def test_kpi_group_named_region_is_not_the_region_slot(count):
+    names = [f"region - Nord {i}" for i in range(count)]
+    [page] = layout_pages(names, max_cols=6, rows_per_page=3)
+    cells = [cell for row in page for cell in row["cells"] if cell]
+    assert [cell["index"] for cell in cells if cell["kind"] == KPI_SLOT] == list(range(count))
+    assert [cell["kind"] for cell in cells].count(REGION_SLOT) == 1
+    assert all(cell["group"] == "region" for cell in cells if cell["kind"] == KPI_SLOT)
+    assert "region</div>" in group_bands_html(page[0]["bands"], 6)
+
+def test_group_bands_html_escapes_titles():
+    bands_html = group_bands_html([("<b>A</b>", 0, 2), (None, 2, 1)], 3)
+    assert "&lt;b&gt;A&lt;/b&gt;" in bands_html and "<b>" not in bands_html
+    assert bands_html.count("group-band empty") == 1
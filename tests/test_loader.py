@@ -0,0 +1,47 @@
+# kpi_loader's incremental JSON array parser against json.loads, with read
+# sizes small enough to split strings, numbers and nested values across reads
+import io
+import json
+
+import pytest
+
+from kpi_loader import JSON_READ_SIZE, iter_json_array
+
+READ_SIZES = [1, 2, 7, JSON_READ_SIZE]
+
+@pytest.mark.parametrize("read_size", READ_SIZES)
+@pytest.mark.parametrize("text", [
+    '[]',
+    ' \n[ ] \n',
+    '[1]',
+    '[12345, -6.02e23, 0.5, 1E-7]',
+    '["a,b", "c]d", "e\\"]", "\\u00e9]"]',
+    '[[1, [2, 3]], [], {"k": [4, "]"]}]',
+    '[true, false, null, {"Objectifs": "Commercial - M prp Net", "poids": 0.03}]',
+    '\t[ 1 ,\r\n 2 ,3 ]\n\n',
+])
+def test_parses_like_json_loads(text, read_size):
+    assert list(iter_json_array(io.StringIO(text), read_size)) == json.loads(text)
+
+@pytest.mark.parametrize("read_size", READ_SIZES)
+@pytest.mark.parametrize("text", [
+    '',
+    '   ',
+    '[1,]',
+    '[1',
+    '[1 2]',
+    '[,1]',
+    '["unterminated]',
+    '[1]garbage',
+    '[1] ]',
+    '[] []',
+])
+def test_rejects_malformed_input(text, read_size):
+    with pytest.raises(ValueError):
+        list(iter_json_array(io.StringIO(text), read_size))
+    with pytest.raises(ValueError):
+        json.loads(text)
+
+def test_rejects_a_top_level_object():
+    with pytest.raises(ValueError, match="Expected a JSON array"):
+        list(iter_json_array(io.StringIO('{"a": 1}')))
@@ -0,0 +1,52 @@
+# Schema migrations on a copy of the shipped kpi_database.db, created before
+# kpis had a (kpi_name, period) key: 2000 rows, 16 KPIs refreshed 125 times
+import os
+import shutil
+import sqlite3
+
+import pytest
+
+import kpi_store
+
+SHIPPED_DB = os.path.join(os.path.dirname(__file__), "..", "kpi_database.db")
+
+@pytest.fixture
+def legacy_db(tmp_path):
+    path = str(tmp_path / "legacy.db")
+    shutil.copyfile(SHIPPED_DB, path)
+    return path
+
+def test_unkeyed_table_is_migrated_with_its_history(legacy_db):
+    conn = kpi_store.init_db(legacy_db)
+    try:
+        assert conn.execute("PRAGMA user_version").fetchone()[0] == kpi_store.SCHEMA_VERSION
+        assert conn.execute("SELECT COUNT(*) FROM kpis").fetchone()[0] == 16
+        # Every copy of the old table is a history point, not only the latest one
+        assert conn.execute("SELECT COUNT(*), COUNT(DISTINCT ts) FROM kpi_history").fetchone() == (2000, 125)
+        assert conn.execute("SELECT COUNT(*) FROM kpis WHERE timestamp NOT LIKE '____-__-__T__:__:__Z'").fetchone()[0] == 0
+        names = {row[0] for row in conn.execute("SELECT name FROM sqlite_master")}
+        assert "kpis_legacy" not in names and "kpis_name_timestamp" not in names
+    finally:
+        conn.close()
+
+def test_interrupted_migration_leaves_the_old_table(legacy_db, monkeypatch):
+    def fail(c):
+        raise sqlite3.OperationalError("disk I/O error")
+    monkeypatch.setattr(kpi_store, "_migrate_scores", fail)
+    with pytest.raises(sqlite3.OperationalError):
+        kpi_store.init_db(legacy_db)
+
+    conn = sqlite3.connect(legacy_db)
+    try:
+        assert conn.execute("PRAGMA user_version").fetchone()[0] == 0
+        assert [row[1] for row in conn.execute("SELECT * FROM sqlite_master")] == ["kpis"]
+        assert conn.execute("SELECT COUNT(*) FROM kpis").fetchone()[0] == 2000
+    finally:
+        conn.close()
+
+    monkeypatch.undo()
+    conn = kpi_store.init_db(legacy_db)
+    try:
+        assert conn.execute("SELECT COUNT(*) FROM kpi_history").fetchone()[0] == 2000
+    finally:
+        conn.close()
@@ -0,0 +1,18 @@
+# The dashboard's write-behind mirror writes to its own database file, never
+# to the API's default-region database
+import os
+
+import kpi_mirror
+import kpi_store
+
+def test_flush_writes_to_the_mirror_database(tmp_path, monkeypatch):
+    monkeypatch.setattr(kpi_store, "DB_PATH", str(tmp_path / "kpi_database.db"))
+    monkeypatch.setattr(kpi_mirror, "MIRROR_DB_PATH", str(tmp_path / "kpi_mirror.db"))
+    monkeypatch.setattr(kpi_mirror, "_start_writer", lambda: None)
+    kpi_mirror.queue_kpis([("Commercial - M prp Net", 56.1, 58185.0, 0.03, 58185.0, 32629.0, 0.017)])
+    try:
+        assert kpi_mirror.flush() == 1
+        assert kpi_store.get_connection(kpi_mirror.MIRROR_DB_PATH).execute("SELECT COUNT(*) FROM kpis").fetchone()[0] == 1
+        assert not os.path.exists(kpi_store.DB_PATH)
+    finally:
+        kpi_store.close_connections()
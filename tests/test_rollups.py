@@ -0,0 +1,58 @@
+# The kpi_rollups triggers against a full rebuild from kpi_history, after a
+# random workload: bulk replaces, upserts, same-second rewrites, deleted history
+# points, NULL rates and scores
+import random
+
+import pytest
+
+import kpi_store
+from consistency import assert_same_rows, random_value, rebuilt_rows
+
+KPI_NAMES = [f"Groupe {i % 3} - KPI {i}" for i in range(12)]
+START = 1_760_000_000  # Thursday 2025-10-09, so weeks and months get crossed
+OPERATIONS = 2000
+
+def random_rows(rng, count):
+    return [(rng.choice(KPI_NAMES), random_value(rng, 150), 1000.0, 0.02, 1000.0, 500.0, random_value(rng, 1))
+            for _ in range(count)]
+
+def run_workload(conn, rng, clock):
+    for _ in range(OPERATIONS):
+        # Mostly new seconds, sometimes the same second again (history points replaced)
+        if rng.random() < 0.7:
+            clock[0] += rng.choice((1, 60, 3600, 86400, 5 * 86400))
+        action = rng.random()
+        if action < 0.1:
+            kpi_store.bulk_replace_kpis(conn, random_rows(rng, rng.randint(1, len(KPI_NAMES))))
+        elif action < 0.9:
+            kpi_store.upsert_kpis(conn, random_rows(rng, rng.randint(1, 4)))
+        else:
+            # A point removed without replacement
+            point = conn.execute("SELECT kpi_name, ts, period FROM kpi_history ORDER BY kpi_name, ts LIMIT 1 OFFSET ?",
+                                 (rng.randint(0, 50),)).fetchone()
+            if point:
+                conn.execute("DELETE FROM kpi_history WHERE kpi_name = ? AND ts = ? AND period = ?", point)
+                conn.commit()
+
+def rollup_rows(conn):
+    return sorted(conn.execute("SELECT * FROM kpi_rollups").fetchall())
+
+def rebuild_rollups(c):
+    c.execute("DELETE FROM kpi_rollups")
+    for grain in kpi_store.ROLLUP_GRAINS:
+        for sql in kpi_store.REBUILD_ROLLUP_SQL:
+            c.execute(sql.format(grain=grain, bucket=kpi_store._rollup_bucket(grain, "ts")))
+
+@pytest.mark.parametrize("seed", [2025, 7])
+def test_rollups_match_rebuild(db, monkeypatch, seed):
+    clock = [START]
+    monkeypatch.setattr(kpi_store, "_timestamp", lambda: (kpi_store.epoch_to_iso(clock[0]), clock[0]))
+    run_workload(db, random.Random(seed), clock)
+    assert_same_rows(rollup_rows(db), rebuilt_rows(db, rebuild_rollups, rollup_rows))
+
+def test_rebuild_comparison_detects_drift(db):
+    kpi_store.upsert_kpis(db, [(KPI_NAMES[0], 50.0, 1000.0, 0.02, 1000.0, 500.0, 0.5)])
+    db.execute("UPDATE kpi_rollups SET rate_sum = rate_sum + 1 WHERE grain = 'day'")
+    db.commit()
+    with pytest.raises(AssertionError):
+        assert_same_rows(rollup_rows(db), rebuilt_rows(db, rebuild_rollups, rollup_rows))
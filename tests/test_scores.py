@@ -0,0 +1,63 @@
+# The kpi_scores triggers against a rebuild from kpis, after a random workload:
+# bulk replaces, upserts moving values between NULL and numbers, duplicate KPIs
+# within a batch, names with and without a "Group - " prefix
+import random
+
+import pytest
+
+import kpi_store
+from consistency import TOLERANCE, assert_same_rows, random_value, rebuilt_rows
+
+KPI_NAMES = [f"Groupe {i % 4} - KPI {i}" for i in range(20)] + ["Sans groupe", "Autre - A - B"]
+OPERATIONS = 2000
+
+def random_rows(rng, count):
+    return [(rng.choice(KPI_NAMES), rng.uniform(0, 150), 1000.0, random_value(rng, 0.05), 1000.0, 500.0,
+             random_value(rng, 0.05)) for _ in range(count)]
+
+def run_workload(conn, rng):
+    for _ in range(OPERATIONS):
+        if rng.random() < 0.1:
+            kpi_store.bulk_replace_kpis(conn, random_rows(rng, rng.randint(0, len(KPI_NAMES))))
+        else:
+            kpi_store.upsert_kpis(conn, random_rows(rng, rng.randint(1, 5)))
+
+# Groups with at least one KPI, as (group, score_sum, poids_sum, kpi_count)
+def score_rows(conn):
+    return sorted(conn.execute("SELECT * FROM kpi_scores WHERE kpi_count > 0").fetchall())
+
+@pytest.mark.parametrize("seed", [2025, 7])
+def test_scores_match_rebuild(db, seed):
+    run_workload(db, random.Random(seed))
+    assert_same_rows(score_rows(db), rebuilt_rows(db, kpi_store._rebuild_scores, score_rows))
+    # Emptied groups must have drained to zero, not drifted
+    leftovers = db.execute("SELECT * FROM kpi_scores WHERE kpi_count = 0 AND "
+                           "(abs(score_sum) > ? OR abs(poids_sum) > ?)", (TOLERANCE, TOLERANCE)).fetchall()
+    assert leftovers == []
+
+# bulk_replace_kpis turns the score triggers off for its transaction; a failed
+# load must roll that back with the data
+def test_failed_bulk_replace_keeps_triggers(db):
+    kpi_store.bulk_replace_kpis(db, [(KPI_NAMES[0], 90.0, 1000.0, 0.02, 1000.0, 900.0, 0.018)])
+
+    def failing_rows():
+        yield (KPI_NAMES[1], 50.0, 1000.0, 0.04, 1000.0, 500.0, 0.02)
+        raise ValueError("bad record")
+    with pytest.raises(ValueError):
+        kpi_store.bulk_replace_kpis(db, failing_rows())
+
+    triggers = {row[0] for row in db.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'")}
+    assert set(kpi_store.SCORES_TRIGGERS) <= triggers
+    assert db.execute("SELECT COUNT(*) FROM kpi_meta WHERE key = 'bulk_replace'").fetchone()[0] == 0
+    kpi_store.upsert_kpis(db, [(KPI_NAMES[2], 70.0, 1000.0, 0.01, 1000.0, 700.0, 0.007)])
+    assert_same_rows(score_rows(db), rebuilt_rows(db, kpi_store._rebuild_scores, score_rows))
+    assert db.execute("SELECT SUM(kpi_count) FROM kpi_scores").fetchone()[0] == 2
+
+# A bulk replace must not change the schema (other connections would have to
+# re-prepare their statements) and leaves the triggers on for later writes
+def test_bulk_replace_keeps_the_schema(db):
+    schema_version = db.execute("PRAGMA schema_version").fetchone()[0]
+    kpi_store.bulk_replace_kpis(db, [(KPI_NAMES[0], 90.0, 1000.0, 0.02, 1000.0, 900.0, 0.018)] * 2)
+    assert db.execute("PRAGMA schema_version").fetchone()[0] == schema_version
+    kpi_store.upsert_kpis(db, [(KPI_NAMES[0], 95.0, 1000.0, 0.02, 1000.0, 950.0, 0.019)])
+    assert score_rows(db) == [("Groupe 0", 0.019, 0.02, 1)]
@@ -0,0 +1,6 @@
+# WSGI entry point for external servers. Each open /stream connection holds a
+# worker thread, so event streams are off unless API_MAX_STREAMS is set; give
+# every worker that many threads on top of the ones for normal requests, e.g.:
+#   python api.py --ingest && API_MAX_STREAMS=50 gunicorn -w 4 --threads 58 -k gthread -b 0.0.0.0:8502 wsgi:app
+# Without it dashboards poll /api/kpis. serve.py sets this up itself.
+from api import app  # noqa: F401